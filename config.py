@@ -17,6 +17,7 @@ INTRO_STIM_DIR = 'data/introduction'
 COMPREHENSION_STIM_DIR = 'data/comprehension'
 TRIAL_STIM_DIR = 'data/stimuli/'
 FIGURE_STORE = 'data/figures'
+LATIN_SQUARE_STIMULI = 'data/latin_square_stimuli.json'
 PROJECT_PATH = '~/projects/eyetracking_physics'
 
 # Default buttons
@@ -24,6 +25,14 @@ RED_BUTTON = 'f'
 BLUE_BUTTON = 'j'
 YELLOW_BUTTON = 'space'
 
+# Eye tracker sampling
+SAMPLING_HZ = 1000
+MAX_TRIAL_S = 10
+MAX_BLOCK_S = 3 * MAX_TRIAL_S
+
+# Video decoding backend passed to psychopy's MovieStim
+MOVIE_LIB = 'ffpyplayer'
+
 # Stimuli sizing
 DEFAULT_WIDTH = 800
 DEFAULT_HEIGHT = 1000
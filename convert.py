@@ -1,16 +1,63 @@
 """Utilities for converting EDF files to ASC files en masse."""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import shutil
 import subprocess
 from pathlib import Path
 
-def convert_edf_files(directory, pattern="*.edf"):
+def is_converted(edf_file):
+    """
+    Check whether an EDF file has an ASC file at least as new as itself.
+    
+    Args:
+        edf_file (Path): The EDF file to check.
+    """
+    asc_file = edf_file.with_suffix(".asc")
+    try:
+        return asc_file.stat().st_mtime_ns >= edf_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+def convert_edf_file(edf_file):
+    """Convert a single EDF file to ASC format with edf2asc.
+
+    Any existing ASC file is stale by the time it gets here, so it is
+    overwritten (-y) rather than edf2asc prompting for it.
+
+    Args:
+        edf_file (Path): The EDF file to convert.
+
+    Returns:
+        str: A report of the conversion, for the caller to print.
+    """
+    # Run edf2asc directly, without a shell
+    # capture_output=True captures both stdout and stderr
+    result = subprocess.run(
+        ["edf2asc", "-y", str(edf_file)],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    output = result.stdout + result.stderr
+    if result.returncode != 0:
+        return f"Error converting {edf_file.name}\nError message: {output}"
+    report = f"Successfully converted {edf_file.name}"
+    # Include command output if any
+    if output:
+        report += f"\nOutput: {output}"
+    return report
+
+def convert_edf_files(directory, pattern="*.edf", force=False):
     """
     Convert EDF files to ASC format using edf2asc command line tool.
     
     Args:
         directory (str): Directory containing EDF files
         pattern (str): File pattern to match EDF files (default: "*.edf")
+        force (bool): Reconvert files whose ASC is already up to date
     """
     # Ensure directory path is absolute
     directory = Path(directory).absolute()
@@ -19,28 +66,24 @@ def convert_edf_files(directory, pattern="*.edf"):
     if not edf_files:
         print(f"No {pattern} files found in {directory}")
         return
+    # Skip files that were already converted since they were last written
+    if not force:
+        edf_files = [f for f in edf_files if not is_converted(f)]
+        if not edf_files:
+            print(f"All {pattern} files in {directory} are already converted")
+            return
     print(f"Found {len(edf_files)} files to convert")
-    for edf_file in edf_files:
-        try:
-            # Run edf2asc with subprocess.run
-            # capture_output=True captures both stdout and stderr
-            result = subprocess.run(
-                ["edf2asc", str(edf_file)],
-                capture_output=True,
-                text=True,
-                check=True  # This will raise CalledProcessError if command fails
-            )
-            print(f"Successfully converted {edf_file.name}")
-            # Print command output if any
-            if result.stdout:
-                print("Output:", result.stdout)
-        except subprocess.CalledProcessError as e:
-            print(f"Error converting {edf_file.name}")
-            print(f"Error message: {e.stdout}")
-        except FileNotFoundError:
-            print("Error: edf2asc command not found.")
-            print("Please ensure it's installed and in your PATH")
-            break
+    # Check for the converter once, rather than failing in every worker
+    if shutil.which("edf2asc") is None:
+        print("Error: edf2asc command not found.")
+        print("Please ensure it's installed and in your PATH")
+        return
+    # edf2asc runs out of process, so threads are enough to convert in parallel
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = [executor.submit(convert_edf_file, f) for f in edf_files]
+        # Print from this thread, so each file's report stays in one piece
+        for future in as_completed(futures):
+            print(future.result())
 
 # Example usage
 if __name__ == "__main__":
@@ -49,5 +92,8 @@ if __name__ == "__main__":
         description='Converts all EDF files in a given directory to ASC.')
     parser.add_argument(
         'directory', type=str, help='The directory of EDF files.')
+    parser.add_argument(
+        '--force', action='store_true',
+        help='Reconvert EDF files that already have an up to date ASC file.')
     args = parser.parse_args()
-    convert_edf_files(args.directory)
\ No newline at end of file
+    convert_edf_files(args.directory, force=args.force)
\ No newline at end of file
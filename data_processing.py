@@ -1,9 +1,14 @@
 import os
 import sys
-from collections import defaultdict
-import json
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # Get the directory containing data_processing.py
 MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -72,6 +77,21 @@ def assign_ground_truth_response(scene_name:str) -> bool:
         raise ValueError(f"Unknown scene name: {scene_name}")
 
 
+def map_scene_names(scene_names:pd.Series, assign) -> pd.Series:
+    """Labels every row by its scene name.
+
+    Calls `assign` once per distinct scene rather than once per row.
+
+    Args:
+        scene_names: The scene name of each row.
+        assign: Maps a scene name to its label, e.g. assign_path_condition.
+
+    Returns:
+        The label of each row.
+    """
+    return scene_names.map({name: assign(name) for name in scene_names.unique()})
+
+
 def scene_to_screen_coordinates(scene_coordinate):
     """Convert scene coordinates to screen coordinates.
     
@@ -91,6 +111,14 @@ def scene_to_screen_coordinates(scene_coordinate):
     return [converted_x, converted_y]
 
 
+# Fields of each type of eye tracking data, by data_type
+DATA_TYPE_FIELDS = {
+    'gaze': parser.Gaze._fields,
+    'fixations': parser.Fixation._fields,
+    'saccades': parser.Saccade._fields
+}
+
+
 def convert_to_dataframe(
     experiment_data:dict, data_type:str='gaze') -> pd.DataFrame:
     """Converts eye tracking data from dictionary format to a pandas DataFrame.
@@ -110,14 +138,10 @@ def convert_to_dataframe(
     Raises:
         ValueError: If data_type is not one of 'gaze', 'fixations', or 'saccades'
     """
-    # Initialize defaultdict to store all data fields
-    all_data = defaultdict(list)
+    # One DataFrame per trial, concatenated once at the end
+    frames = []
     # Get the appropriate namedtuple fields based on data type
-    fields = {
-        'gaze': parser.Gaze._fields,
-        'fixations': parser.Fixation._fields, 
-        'saccades': parser.Saccade._fields
-    }.get(data_type)
+    fields = DATA_TYPE_FIELDS.get(data_type)
     if fields is None:
         raise ValueError(f"Invalid data_type: {data_type}")
     # Pre-calculate number of subjects for iteration
@@ -129,31 +153,53 @@ def convert_to_dataframe(
         subject_treatment = experiment_data['subject_treatment'][idx]
         # Process each trial for this subject
         for t in trials:
-            n_points = len(t[data_type])
-            if n_points == 0:
+            points = t[data_type]
+            if len(points) == 0:
                 continue
-            # Create metadata dictionary - values repeated for each data point
-            metadata = {
-                'subject_id': [subject_id] * n_points,
-                'subject_treatment': [subject_treatment] * n_points,
-                'scene_name': [t['scene_name']] * n_points,
-                'block_index': [t['block_idx']] * n_points,
-                'button_response': [t['button_response']] * n_points,
-                'response_time': [t['response_time']] * n_points,
-                'block_duration': [t['block_duration']] * n_points,
-                'trial_duration': [t['trial_duration']] * n_points
-            }
-            # Add all metadata fields to the data collection
-            for key, values in metadata.items():
-                all_data[key].extend(values)
-            # Extract and add the eye tracking data points
-            for field_idx, field in enumerate(fields):
-                all_data[field].extend(point[field_idx] for point in t[data_type])
-    return pd.DataFrame(all_data)
+            # Metadata is scalar and broadcast to every data point, the eye
+            #   tracking data is taken column by column from the array
+            frames.append(pd.DataFrame({
+                'subject_id': subject_id,
+                'subject_treatment': subject_treatment,
+                'scene_name': t['scene_name'],
+                'block_index': t['block_idx'],
+                'button_response': t['button_response'],
+                'response_time': t['response_time'],
+                'block_duration': t['block_duration'],
+                'trial_duration': t['trial_duration'],
+                **{field: points[field] for field in fields}
+            }))
+    if not frames:
+        return pd.DataFrame()
+    # Trials with missing metadata (None) leave object columns behind
+    return pd.concat(frames, ignore_index=True).infer_objects()
+
+
+def parse_eyedata_files(executor, asc_paths:list[str], window:int):
+    """Parses ASC files in parallel, yielding their trials in order.
+
+    At most `window` files are parsed ahead of the consumer, so finished
+    results don't pile up while earlier ones are still being converted.
+
+    Args:
+        executor: The process pool to parse on.
+        asc_paths: Paths to the ASC files.
+        window: The number of files in flight at once.
+
+    Yields:
+        The parsed trials of each file.
+    """
+    pending = deque()
+    for path in asc_paths:
+        if len(pending) == window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(parser.parse_eyedata, path))
+    while pending:
+        yield pending.popleft().result()
 
 
 def import_gaze_data(
-    data_dir:str=os.path.join(config.DATA_DIR, 'experiment1'),
+    data_dir:str=config.EXP1_DATA_DIR,
     data_type:str='gaze',
     include_fixations:bool=False
     ) -> pd.DataFrame:
@@ -164,30 +210,44 @@ def import_gaze_data(
 
     Returns:
         DataFrame with the gaze data.
+
+    Raises:
+        ValueError: If data_type is not one of 'gaze', 'fixations', or 'saccades'
     """
+    # Fail before any file is handed to the process pool
+    if data_type not in DATA_TYPE_FIELDS:
+        raise ValueError(f"Invalid data_type: {data_type}")
     asc_files = [
         f
         for f
         in os.listdir(data_dir)
         if f.endswith('.asc')
     ]
-    # Row structure for trial data dataframe
-    experiment_data = {
-        'subject_id': [],
-        'subject_treatment': [],
-        'trials': []
-    }
-    # Define process_file function outside to make it pickleable
-    for fname in tqdm(asc_files, desc="Processing ASC files"):
-        subject_id = fname.split('_')[0]
-        subject_treatment = fname.split('_')[1].split('.')[0]
-        trials = parser.parse_eyedata(
-            os.path.join(data_dir, f'{fname}'))
-        experiment_data['subject_id'].append(subject_id)
-        experiment_data['subject_treatment'].append(subject_treatment)
-        experiment_data['trials'].append(trials)
-    # Convert the dictionary to a dataframe
-    return convert_to_dataframe(experiment_data, data_type)
+    # Files are independent, so parse them in parallel. parser.parse_eyedata
+    #   is a module-level function and so is pickleable
+    asc_paths = [os.path.join(data_dir, fname) for fname in asc_files]
+    subject_frames = []
+    max_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Convert each subject as its trials arrive. Parsed trials are held
+        #   for at most max_workers subjects, plus the one being converted
+        parsed = parse_eyedata_files(executor, asc_paths, max_workers)
+        for fname, trials in zip(
+                asc_files,
+                tqdm(parsed, total=len(asc_paths), desc="Processing ASC files")):
+            subject_id = fname.split('_')[0]
+            subject_treatment = fname.split('_')[1].split('.')[0]
+            # Row structure for trial data dataframe
+            experiment_data = {
+                'subject_id': [subject_id],
+                'subject_treatment': [subject_treatment],
+                'trials': [trials]
+            }
+            subject_frames.append(
+                convert_to_dataframe(experiment_data, data_type))
+    if not subject_frames:
+        return pd.DataFrame()
+    return pd.concat(subject_frames, ignore_index=True)
 
 
 def get_intra_trial_data(gaze_data:pd.DataFrame) -> pd.DataFrame:
@@ -203,8 +263,8 @@ def get_intra_trial_data(gaze_data:pd.DataFrame) -> pd.DataFrame:
     # Check if the scene name contains 'intra'
     intra_trial_gaze_data = gaze_data[gaze_data.scene_name.str.contains('intra')]
     # Replace '_intra' with ''
-    intra_trial_gaze_data.scene_name = intra_trial_gaze_data.scene_name.apply(
-        lambda x: x.replace('_intra', ''))
+    intra_trial_gaze_data.scene_name = intra_trial_gaze_data.scene_name.str.replace(
+        '_intra', '', regex=False)
     # Remove the comprehension trials
     intra_trial_gaze_data = intra_trial_gaze_data[
         ~intra_trial_gaze_data.scene_name.str.contains('comprehension')]
@@ -278,8 +338,8 @@ def process_ball_and_gaze_data(gaze_df:pd.DataFrame) -> pd.DataFrame:
     # Process each scene description file
     for sd_file in scene_desc_files:
         scene_name = os.path.splitext(os.path.basename(sd_file))[0]
-        with open(sd_file, 'r') as f:
-            data = json.load(f)
+        with open(sd_file, 'rb') as f:
+            data = json_loads(f.read())
             for item in data:
                 if item['type'] == 'Dynamic':
                     ball_pos_data['scene_name'].append(scene_name)
@@ -365,7 +425,7 @@ def clean_gaze_data(df):
 
 
 def get_human_data(
-        data_dir:str=os.path.join(MODULE_DIR, config.DATA_DIR, 'experiment1'),
+        data_dir:str=os.path.join(MODULE_DIR, config.EXP1_DATA_DIR),
         remove_outliers:bool=False,
         include:str='both'
         ) -> pd.DataFrame:
@@ -398,8 +458,8 @@ def get_human_data(
         human_data = clean_gaze_data(human_data)
     if include in ('behavioral', 'both'):
         print(human_data.head())
-        human_data['correct_response'] = human_data.scene_name.apply(
-            assign_ground_truth_response)
+        human_data['correct_response'] = map_scene_names(
+            human_data.scene_name, assign_ground_truth_response)
         # Map the key press for the button to the yes/no value of that key
         human_data['button_value'] = human_data.button_value == 'yes'
         # Determine whether the button press was correct or not
@@ -421,15 +481,19 @@ def get_human_data(
         human_data = pd.merge(
             left=human_data, right=mean_accuracy_scene, on='scene_name')
         # Assign the path condition labels to each row
-        human_data['path_condition'] = human_data.scene_name.apply(assign_path_condition)
+        human_data['path_condition'] = map_scene_names(
+            human_data.scene_name, assign_path_condition)
         # Assign the simulation time condition to each row
-        human_data['sim_time_condition'] = human_data.scene_name.apply(assign_sim_time_condition)
+        human_data['sim_time_condition'] = map_scene_names(
+            human_data.scene_name, assign_sim_time_condition)
         # Label the scenes according to which experiment they're from
-        human_data['experiment'] = human_data.scene_name.apply(assign_experiment_label)
+        human_data['experiment'] = map_scene_names(
+            human_data.scene_name, assign_experiment_label)
         # Calculate the z-score of the trial duration
-        human_data['trial_duration_zscore'] = human_data.groupby(
-            'subject_id')['trial_duration'].transform(
-                lambda x: (x-x.mean())/x.std())
+        trial_durations = human_data.groupby('subject_id')['trial_duration']
+        human_data['trial_duration_zscore'] = (
+            (human_data['trial_duration'] - trial_durations.transform('mean'))
+            / trial_durations.transform('std'))
         if include == 'behavioral':
             human_data = human_data[
                 [
@@ -499,8 +563,8 @@ def get_simulation_model_predictions(
     Returns:
         The simulation model predictions.
     """
-    with open(data_dir, 'r') as f:
-        simulation_model_predictions_dict = json.load(f)
+    with open(data_dir, 'rb') as f:
+        simulation_model_predictions_dict = json_loads(f.read())
     simulation_prediction_data = pd.DataFrame.from_dict(
         simulation_model_predictions_dict)
     return simulation_prediction_data
@@ -508,7 +572,7 @@ def get_simulation_model_predictions(
 
 def main():
     # Get raw gaze data
-    fixation_data = import_gaze_data(data_dir=os.path.join(MODULE_DIR, config.DATA_DIR, 'experiment1'), data_type='fixations')
+    fixation_data = import_gaze_data(data_dir=os.path.join(MODULE_DIR, config.EXP1_DATA_DIR), data_type='fixations')
     print(fixation_data.head())
 
 if __name__ == '__main__':
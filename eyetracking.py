@@ -1,38 +1,133 @@
 """Utilities and classes for EyeLink interface and using mouse as gaze data."""
 
+import functools
 import hashlib
 import logging
 import os
+import subprocess
 import time
+from typing import TYPE_CHECKING
 
-import pylink
 from psychopy import visual, core, event, monitors
+from psychopy.hardware import keyboard
 import numpy as np
 
-from EyeLinkCoreGraphicsPsychoPy import EyeLinkCoreGraphicsPsychoPy
+import config
+
+# NOTE: pylink and the calibration graphics are lazily imported, see _pylink
+if TYPE_CHECKING:
+    import pylink
+
+_log = logging.getLogger(__name__)
+
+# Layout of the buffered gaze samples, one row per sample
+SAMPLE_DTYPE = np.dtype([('t', np.float64), ('x', np.float32), ('y', np.float32)])
+
+# Keys accepted by the drift check prompts
+DRIFT_CHECK_KEYS = ('space', 'escape')
+DRIFT_MENU_KEYS = ('space', 'c', 'a', 'r', 'd')
+
+
+@functools.cache
+def get_keyboard() -> keyboard.Keyboard:
+    '''Returns the shared keyboard, created on first use.'''
+    return keyboard.Keyboard()
+
+
+def _wait_keys(key_list:tuple[str]) -> list[str]:
+    '''Blocks until one of the given keys is pressed.
+
+    Args:
+        key_list: The keys to wait for.
+    Returns:
+        The names of the pressed keys.
+    '''
+    presses = get_keyboard().waitKeys(keyList=key_list, waitRelease=False)
+    return [press.name for press in presses]
+
+
+def _sample_buffer() -> np.ndarray:
+    '''Returns an empty sample buffer with room for a typical trial.'''
+    return np.empty(
+        int(config.MAX_TRIAL_S * config.SAMPLING_HZ * 1.5), dtype=SAMPLE_DTYPE)
+
+
+def _pylink():
+    '''Imports pylink on first use, since it loads the native EyeLink library.'''
+    import pylink
+    return pylink
+
+
+def _graphics_env(tracker, win):
+    '''Builds the PsychoPy calibration graphics environment.
+
+    Args:
+        tracker: A pylink.EyeLink tracker, or None for the mouse.
+        win: The display window.
+    Returns:
+        An EyeLinkCoreGraphicsPsychoPy instance.
+    '''
+    from EyeLinkCoreGraphicsPsychoPy import EyeLinkCoreGraphicsPsychoPy
+    return EyeLinkCoreGraphicsPsychoPy(tracker, win)
 
 
 def hide_dock() -> None:
     '''Function for hiding the dock on MacOS.'''
-    os.system("""osascript -e '
-    tell application "System Events"
-      set autohide of dock preferences to true
-    end tell
-    '""")
+    subprocess.run(
+        [
+            'osascript',
+            '-e',
+            'tell application "System Events" to '
+            'set autohide of dock preferences to true',
+        ],
+        check=False)
 
 
+@functools.lru_cache(maxsize=256)
 def ensure_edf_filename(name:str) -> str:
     '''Ensures EDF file has reproducible unique 12-character name.
+
+    The Host PC only accepts 8.3 file names, so the stem is the 8 hex digits
+    of a 4-byte BLAKE2b digest.
     
     Args:
         name: The file name to be ensured (hashed).
     Returns:
-        MD5 hash of name argument.
+        BLAKE2b hash of name argument.
     '''
-    return hashlib.md5(name.encode()).hexdigest()[:8] + '.EDF'
-
-
-def configure_data(tracker:pylink.EyeLink) -> None:
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4)
+    return digest.hexdigest() + '.EDF'
+
+
+# pylint: disable=line-too-long
+# Eye events to save in the EDF file
+_FILE_EVENT_CMD = 'file_event_filter = LEFT,RIGHT,FIXATION,SACCADE,BLINK,MESSAGE,BUTTON,INPUT'
+# Eye events to make available over the link
+_LINK_EVENT_CMD = 'link_event_filter = LEFT,RIGHT,FIXATION,SACCADE,BLINK,BUTTON,FIXUPDATE,INPUT'
+# Setup commands for EyeLink 1000 Plus and later. The sample data saved in the
+#   EDF data file and made available over the link includes the 'HTARGET' flag
+#   to save head target sticker data.
+_SETUP_CMDS_V4 = (
+    _FILE_EVENT_CMD,
+    'file_sample_data = LEFT,RIGHT,GAZE,HREF,RAW,AREA,HTARGET,GAZERES,BUTTON,STATUS,INPUT',
+    _LINK_EVENT_CMD,
+    'link_sample_data = LEFT,RIGHT,GAZE,GAZERES,AREA,HTARGET,STATUS,INPUT',
+    'calibration_type = HV9',
+    'enable_automatic_calibration = NO',
+)
+# Setup commands for older trackers, which have no head target sticker
+_SETUP_CMDS_V3 = (
+    _FILE_EVENT_CMD,
+    'file_sample_data = LEFT,RIGHT,GAZE,HREF,RAW,AREA,GAZERES,BUTTON,STATUS,INPUT',
+    _LINK_EVENT_CMD,
+    'link_sample_data = LEFT,RIGHT,GAZE,GAZERES,AREA,STATUS,INPUT',
+    'calibration_type = HV9',
+    'enable_automatic_calibration = NO',
+)
+# pylint: enable=line-too-long
+
+
+def configure_data(tracker:'pylink.EyeLink') -> None:
     '''Configures data for the EyeLink tracker.
     
     Args:
@@ -40,76 +135,97 @@ def configure_data(tracker:pylink.EyeLink) -> None:
     Returns:
         None
     '''
-    # pylint: disable=line-too-long
     vstr = tracker.getTrackerVersionString()
     eyelink_ver = int(vstr.split()[-1].split('.')[0])
-    # Define eye events to save in the EDF file
-    file_event_flags = 'LEFT,RIGHT,FIXATION,SACCADE,BLINK,MESSAGE,BUTTON,INPUT'
-    # Define eye events to make available over the link
-    link_event_flags = 'LEFT,RIGHT,FIXATION,SACCADE,BLINK,BUTTON,FIXUPDATE,INPUT'
-    # Define sample data to save in the EDF data file and to make available
-    #   over the link, include the 'HTARGET' flag to save head target sticker
-    #   data for supported eye trackers.
-    if eyelink_ver > 3:
-        file_sample_flags = 'LEFT,RIGHT,GAZE,HREF,RAW,AREA,HTARGET,GAZERES,BUTTON,STATUS,INPUT'
-        link_sample_flags = 'LEFT,RIGHT,GAZE,GAZERES,AREA,HTARGET,STATUS,INPUT'
-    else:
-        file_sample_flags = 'LEFT,RIGHT,GAZE,HREF,RAW,AREA,GAZERES,BUTTON,STATUS,INPUT'
-        link_sample_flags = 'LEFT,RIGHT,GAZE,GAZERES,AREA,STATUS,INPUT'
-    tracker.sendCommand(f'file_event_filter = {file_event_flags}')
-    tracker.sendCommand(f'file_sample_data = {file_sample_flags}')
-    tracker.sendCommand(f'link_event_filter = {link_event_flags}')
-    tracker.sendCommand(f'link_sample_data = {link_sample_flags}')
-    tracker.sendCommand('calibration_type = HV9')
-    tracker.sendCommand('enable_automatic_calibration = NO')
-    # pylint: enable=line-too-long
-
-
-def pix2height(win:visual.Window, pos:list[float | int] | tuple) -> tuple:
+    # Send the whole setup back to back
+    for command in (_SETUP_CMDS_V4 if eyelink_ver > 3 else _SETUP_CMDS_V3):
+        tracker.sendCommand(command)
+
+
+def pix2height(
+        win:visual.Window,
+        pos:list[float | int] | tuple | np.ndarray) -> np.ndarray:
     '''Converts pixel units to height units for a given window.
+
+    Accepts a single (x,y) position or an (N,2) array of positions.
     
     Args:
         win: The display window.
-        pos: The position.
+        pos: The position(s).
     Returns:
-        Adjusted position (x,y).
+        Adjusted position(s) (x,y).
     '''
     assert win.units == 'height'
     w, h = win.size / 2  # eyetracker uses non-retina pixels
-    x, y = pos
-    y *= -1  # invert y axis
-    x -= w/2
-    y +=  h/2
-    y /= h  # scale
-    x /= h
-    return x, y
+    # invert y axis, center and scale
+    scale = np.array([1/h, -1/h])
+    offset = np.array([-w/(2*h), 0.5])
+    return np.asarray(pos, dtype=np.float64) * scale + offset
 
 
 def height2pix(
         win:visual.Window,
-        pos:list[float | int] | tuple,
-        retina=False) -> tuple:
+        pos:list[float | int] | tuple | np.ndarray,
+        retina=False) -> np.ndarray:
     '''Converts height units to pixel units for a given window.
+
+    Accepts a single (x,y) position or an (N,2) array of positions.
     
     Args:
         win: The display window.
-        pos: The position.
+        pos: The position(s).
     Returns:
-        Adjusted position (x,y).
+        Adjusted position(s) (x,y).
     '''
     assert win.units == 'height'
     if retina:
         w, h = win.size / 2  # eyetracker uses non-retina pixels
     else:
         w, h = win.size
-    x, y = pos
-    # scale and invert y
-    y *= -h
-    x *= h
-    # center
-    x += w/2
-    y +=  h/2
-    return x, y
+    # scale and invert y, then center
+    scale = np.array([h, -h])
+    offset = np.array([w/2, h/2])
+    return np.asarray(pos, dtype=np.float64) * scale + offset
+
+
+# Calibration points relative to the 800x1000 pixel stimulus area
+CAL_POINTS = (
+    (400,500),
+    (400,85),
+    (400,915),
+    (48,500),
+    (752,500),
+    (48,85),
+    (752,85),
+    (48,915),
+    (752,915),
+    (224,292),
+    (576,292),
+    (224,708),
+    (576,708),
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _build_cal_str(
+        scn_width:int,
+        scn_height:int,
+        stim_width:int=800,
+        stim_height:int=1000) -> str:
+    '''Formats CAL_POINTS as EyeLink screen coordinates.
+
+    Args:
+        scn_width: Screen width in pixels.
+        scn_height: Screen height in pixels.
+        stim_width: Stimulus width in pixels.
+        stim_height: Stimulus height in pixels.
+    Returns:
+        Comma separated x,y pairs centered on the screen.
+    '''
+    # Calculate offsets to center the stimulus area
+    offset_x = (scn_width - stim_width) // 2
+    offset_y = (scn_height - stim_height) // 2
+    return ','.join(f'{x + offset_x},{y + offset_y}' for x, y in CAL_POINTS)
 
 
 class EyelinkError(Exception):
@@ -124,19 +240,30 @@ class EyeLink(object):
         uniqueid: A unique string identifier.
         dummy_mode: boolean flag for debugging.
     """
+    __slots__ = (
+        'win', 'tracker', 'uniqueid', 'edf_file', 'dummy_mode',
+        'disable_drift_checks', 'genv', '_scn_w', '_scn_h', '_samples',
+        '_n_samples')
+
     def __init__(self, win:visual.Window, uniqueid:str, dummy_mode:bool=False):
-        logging.info('New EyeLink object')
+        _log.info('New EyeLink object')
         self.win = win
+        # Screen resolution, fixed for the session
+        self._scn_w, self._scn_h = (int(v) for v in win.monitor.getSizePix())
         uniqueid = uniqueid.replace(':', '_')
         self.dummy_mode = dummy_mode
         self.uniqueid = uniqueid
         self.edf_file = ensure_edf_filename(uniqueid)
         self.disable_drift_checks = False
+        # Gaze samples drained from the link as (t, x, y) rows
+        self._samples = _sample_buffer()
+        self._n_samples = 0
+        pylink = _pylink()
         if pylink.getEYELINK():
-            logging.info('Using existing tracker')
+            _log.info('Using existing tracker')
             self.tracker = pylink.getEYELINK()
         else:
-            logging.info('Initializing new tracker')
+            _log.info('Initializing new tracker')
             if dummy_mode:
                 self.tracker = pylink.EyeLink(None)
             else:
@@ -146,7 +273,7 @@ class EyeLink(object):
                 configure_data(self.tracker)
                 self.setup_calibration()
                 self.tracker.setOfflineMode()
-                logging.info('Tracker initialized')
+                _log.info('Tracker initialized')
 
     def drift_check(self, pos:tuple[int | float]=(0,0)) -> str:
         """Perform a drift correct on the eye tracker.
@@ -157,18 +284,18 @@ class EyeLink(object):
         # TODO: might want to implement this myself, to make it more stringent
         if self.disable_drift_checks:
             return self.fake_drift_check(pos)
-        self.win.units = 'height'
-        x, y = map(int, height2pix(self.win, pos))
+        self._ensure_height_units()
+        x, y = np.rint(height2pix(self.win, pos)).astype(np.int32).tolist()
         try:
             self.tracker.doDriftCorrect(x, y, 1, 1)
         except RuntimeError:
-            logging.info('escape in drift correct')
+            _log.info('escape in drift correct')
             self.win.showMessage(
                 '''Experimenter, choose:\n(C)ontinue  (A)bort  (R)ecalibrate 
                 (D)isable drift check''')
             self.win.flip()
-            keys = event.waitKeys(keyList=['space', 'c', 'a', 'r', 'd'])
-            logging.info('drift check keys %s', keys)
+            keys = _wait_keys(DRIFT_MENU_KEYS)
+            _log.info('drift check keys %s', keys)
             self.win.showMessage(None)
             self.win.flip()
             if 'a' in keys:
@@ -181,24 +308,24 @@ class EyeLink(object):
             self.drift_check(pos)
             return 'ok'
         finally:
-            self.win.units = 'height'
+            # The calibration graphics may have switched the window to pixels
+            self._ensure_height_units()
 
     def fake_drift_check(self, pos:tuple[int | float]=(0,0)) -> str:
         """Perform a fake drift check."""
-        self.win.units = 'height'
-        x, y = map(int, height2pix(self.win, pos))
+        self._ensure_height_units()
+        x, y = np.rint(height2pix(self.win, pos)).astype(np.int32).tolist()
         self.genv.update_cal_target()
         self.genv.draw_cal_target(x, y)
-        self.win.units = 'height'
-        keys = event.waitKeys(keyList=['space', 'escape'])
+        keys = _wait_keys(DRIFT_CHECK_KEYS)
         if 'space' in keys:
             return 'ok'
         self.win.showMessage(
                 '''Experimenter, choose:\n(C)ontinue  (A)bort  (R)ecalibrate 
                 (D)isable drift check''')
         self.win.flip()
-        keys = event.waitKeys(keyList=['space', 'c', 'a', 'r', 'd'])
-        logging.info('drift check keys %s', keys)
+        keys = _wait_keys(DRIFT_MENU_KEYS)
+        _log.info('drift check keys %s', keys)
         self.win.showMessage(None)
         self.win.flip()
         if 'a' in keys:
@@ -211,6 +338,11 @@ class EyeLink(object):
         self.drift_check(pos)
         return 'ok'
 
+    def _ensure_height_units(self) -> None:
+        """Sets the window units to height, skipping the setter if already so."""
+        if self.win.units != 'height':
+            self.win.units = 'height'
+
     def message(self, msg:str, log:bool=True) -> None:
         """Sends message to eye tracker.
         
@@ -218,19 +350,19 @@ class EyeLink(object):
             msg: The custom message to send to eye tracker.
             log: Boolean for logging the message.
         """
-        if log:
-            logging.debug('EyeLink.message %s', msg)
+        if log and _log.isEnabledFor(logging.DEBUG):
+            _log.debug('EyeLink.message %s', msg)
         self.tracker.sendMessage(msg)
 
     def start_recording(self) -> None:
         """Starts the tracker recording."""
-        logging.info('start_recording')
+        _log.info('start_recording')
         self.tracker.startRecording(1, 1, 1, 1)
-        pylink.pumpDelay(100)  # maybe necessary to clear out old samples??
+        _pylink().pumpDelay(100)  # maybe necessary to clear out old samples??
 
     def stop_recording(self) -> None:
         """Stops the tracker recording."""
-        logging.info('stop_recording')
+        _log.info('stop_recording')
         self.tracker.stopRecording()
 
     def set_custom_calibration_points(self) -> None:
@@ -239,37 +371,9 @@ class EyeLink(object):
         These points are centered on the screen with a bounding box of equal
         size to the stimuli: 800x1000 pixels.
         """
-        # Screen dimensions
-        scn_width, scn_height = self.win.monitor.getSizePix()
-        # Stimulus dimensions
-        stim_width, stim_height = 800, 1000
-        # Calculate offsets to center the stimulus area
-        offset_x = (scn_width - stim_width) // 2
-        offset_y = (scn_height - stim_height) // 2
+        cal_point_str = _build_cal_str(self._scn_w, self._scn_h)
         # Ensure that the custom calibration settings take effect
         self.tracker.sendCommand("generate_default_targets = NO")
-        # Define calibration points relative to stimulus area
-        cal_points = [
-            (400,500),
-            (400,85),
-            (400,915),
-            (48,500),
-            (752,500),
-            (48,85),
-            (752,85),
-            (48,915),
-            (752,915),
-            (224,292),
-            (576,292),
-            (224,708),
-            (576,708)
-        ]
-         # Adjust calibration points to screen coordinates
-        adjusted_points = [
-            (x + offset_x, y + offset_y) for x, y in cal_points
-        ]
-        # Convert to string format required by EyeLink
-        cal_point_str = ','.join(f'{x},{y}' for x, y in adjusted_points)
         # Set calibration points
         self.tracker.sendCommand("calibration_type = HV13")
         self.tracker.sendCommand(f"calibration_targets = {cal_point_str}")
@@ -279,8 +383,7 @@ class EyeLink(object):
     def setup_calibration(self) -> None:
         """Method for defining tracker calibration parameters."""
         self.message('Set up calibration')
-        # Get the screen resolution
-        scn_width, scn_height = self.win.monitor.getSizePix()
+        scn_width, scn_height = self._scn_w, self._scn_h
         # Pass display pixel coordinates (left, top, right, bottom) to tracker
         el_coords = 'screen_pixel_coords = 0 0 %d %d' % (
             scn_width - 1, scn_height - 1)
@@ -290,7 +393,7 @@ class EyeLink(object):
             scn_width - 1, scn_height - 1)
         self.tracker.sendMessage(dv_coords)
         # Configure a graphics environment (genv) for tracker calibration
-        self.genv = EyeLinkCoreGraphicsPsychoPy(self.tracker, self.win)
+        self.genv = _graphics_env(self.tracker, self.win)
         foreground_color = (-1, -1, -1)
         self.genv.setCalibrationColors(foreground_color, self.win.color)
         # Set up the calibration target
@@ -299,6 +402,7 @@ class EyeLink(object):
         self.genv.setTargetSize(24)
         # Beeps to play during calibration, validation and drift correction
         self.genv.setCalibrationSounds('', '', '')
+        pylink = _pylink()
         pylink.closeGraphics()
         # Request Pylink to use PsychoPy window we opened above for calibration
         pylink.openGraphicsEx(self.genv)
@@ -333,8 +437,7 @@ class EyeLink(object):
         # resources e.g., files defining the interest areas used in each trial
         if not data_dir:
             data_dir = 'data'
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
+        os.makedirs(data_dir, exist_ok=True)
         if not latin_square_seq:
             latin_square_seq = 'A'
         # Download the EDF data file from the Host PC to a local data folder
@@ -342,10 +445,10 @@ class EyeLink(object):
         #   `destination_file_on_local_drive`
         local_edf_fname = self.edf_file.split('.')[0]+f'_{latin_square_seq}' + f'_{yes_button}.edf'
         local_edf = os.path.join(data_dir,  local_edf_fname)
-        logging.info('receiving eyelink data')
+        _log.info('receiving eyelink data')
         # Saves the eye tracker file locally to your machine.
         self.tracker.receiveDataFile(self.edf_file, local_edf)
-        logging.info('wrote %s', local_edf)
+        _log.info('wrote %s', local_edf)
         self.tracker.close()
 
     def gaze_position(self) -> list[int | float]:
@@ -360,6 +463,60 @@ class EyeLink(object):
         eye = sample.getLeftEye() or sample.getRightEye()
         return eye.getGaze()
 
+    def gaze_position_into(self, out:np.ndarray) -> np.ndarray:
+        """Writes the current x,y gaze position into a preallocated buffer.
+
+        Allocation-free variant of `gaze_position` for tight polling loops.
+
+        Args:
+            out: A buffer with room for two floats, reused between calls.
+        Returns:
+            The out buffer.
+        """
+        sample = self.tracker.getNewestSample()
+        if sample is None:
+            out[0] = out[1] = -100000
+            return out
+        eye = sample.getLeftEye() or sample.getRightEye()
+        out[0], out[1] = eye.getGaze()
+        return out
+
+    def _append_sample(self, t:float, x:float, y:float) -> None:
+        """Appends a (t, x, y) row to the sample buffer, growing it if full."""
+        if self._n_samples == len(self._samples):
+            self._samples = np.concatenate(
+                (self._samples, np.empty_like(self._samples)))
+        self._samples[self._n_samples] = (t, x, y)
+        self._n_samples += 1
+
+    def drain_samples(self) -> np.ndarray:
+        """Moves every sample queued on the link into the sample buffer.
+
+        Called once a trial is over, so the frame loop makes no tracker reads.
+        The link queue is bounded and drops its oldest samples on very long
+        trials; the EDF file on the host still records every sample.
+
+        Returns:
+            A SAMPLE_DTYPE view of the rows buffered since `clear_samples`.
+        """
+        sample_type = _pylink().SAMPLE_TYPE
+        while True:
+            data_type = self.tracker.getNextData()
+            if not data_type:
+                break
+            if data_type != sample_type:
+                continue
+            sample = self.tracker.getFloatData()
+            eye = sample.getLeftEye() or sample.getRightEye()
+            if eye is None:
+                continue
+            self._append_sample(sample.getTime(), *eye.getGaze())
+        return self._samples[:self._n_samples]
+
+    def clear_samples(self) -> None:
+        """Empties the sample buffer, e.g. at the start of a trial."""
+        self._n_samples = 0
+
     def close_connection(self) -> None:
         """Closes connection to eye tracker."""
         # TODO make sure this gets called
@@ -367,7 +524,22 @@ class EyeLink(object):
             self.tracker.close()
 
 
-class MouseLink(EyeLink):
+class NullEyeLink:
+    """Mixin that turns the tracker-facing EyeLink methods into no-ops.
+
+    The no-ops share a single implementation and do no logging, so they
+    cost one function call each.
+    """
+    __slots__ = ()
+
+    def _null(self, *args, **kwargs) -> None:
+        """Ignores a tracker operation."""
+
+    message = start_recording = stop_recording = _null
+    setup_calibration = calibrate = save_data = close_connection = _null
+
+
+class MouseLink(NullEyeLink, EyeLink):
     """A pylink interface that uses the mouse as a dummy EyeLink.
     
     Mouse positional data is interpreted as eye gaze data.
@@ -377,12 +549,20 @@ class MouseLink(EyeLink):
         uniqueid: The mouselink's unique id.
         dummy_mode: Optional flag for debugging.
     """
+    __slots__ = ('mouse', '_n_converted')
+
     def __init__(self, win, uniqueid, dummy_mode=False):
         self.win = win
         self.mouse = event.Mouse()
         self.disable_drift_checks = False
+        # Screen resolution, the pixel space EyeLink reports gaze in
+        self._scn_w, self._scn_h = (int(v) for v in win.monitor.getSizePix())
+        self._samples = _sample_buffer()
+        self._n_samples = 0
+        # Samples before this row are already converted to pixels
+        self._n_converted = 0
         print("UNITS", self.win.units)
-        self.genv = genv = EyeLinkCoreGraphicsPsychoPy(None, self.win)
+        self.genv = genv = _graphics_env(None, self.win)
         foreground_color = (-1, -1, -1)
         genv.setCalibrationColors(foreground_color, self.win.color)
         genv.setTargetType('circle')
@@ -393,39 +573,39 @@ class MouseLink(EyeLink):
         print("UNITS", self.win.units)
 
     def drift_check(self, pos=(0,0)):
-        logging.info('MouseLink drift_check')
+        _log.info('MouseLink drift_check')
         return super().fake_drift_check()
 
-    def message(self, msg, log=True):
-        logging.debug('MouseLink message')
-        return
-
-    def start_recording(self):
-        logging.info('MouseLink start_recording')
-        return
-
-    def stop_recording(self):
-        logging.info('MouseLink stop_recording')
-        return
-
-    def setup_calibration(self, full_screen=False):
-        logging.info('MouseLink setup_calibration')
-        return
+    def gaze_position(self):
+        return self.mouse.getPos()
 
-    def calibrate(self):
-        logging.info('MouseLink calibrate')
-        return
+    def gaze_position_into(self, out):
+        out[0], out[1] = self.mouse.getPos()
+        return out
 
-    def save_data(self, data_dir, latin_square_seq):
-        logging.info('MouseLink save_data')
-        return
+    def poll_sample(self):
+        """Records the current mouse position, still in height units."""
+        x, y = self.mouse.getPos()
+        self._append_sample(time.perf_counter() * 1000, x, y)
 
-    def gaze_position(self):
-        return self.mouse.getPos()
+    def drain_samples(self):
+        """Records the current mouse position and converts the polled samples.
 
-    def close_connection(self):
-        logging.info('MouseLink close_connection')
-        return
+        Samples polled since the last drain, e.g. at the end of a trial, are
+        converted to pixels together.
+        """
+        self.poll_sample()
+        pending = self._samples[self._n_converted:self._n_samples]
+        # Convert to the tracker's screen_pixel_coords rather than win.size,
+        #   which counts retina pixels, so mouse and EyeLink gaze match
+        pending['x'] = pending['x'] * self._scn_h + self._scn_w / 2
+        pending['y'] = self._scn_h / 2 - pending['y'] * self._scn_h
+        self._n_converted = self._n_samples
+        return self._samples[:self._n_samples]
+
+    def clear_samples(self):
+        super().clear_samples()
+        self._n_converted = 0
 
 
 if __name__ == '__main__':
@@ -1,373 +1,268 @@
 """Main entrypoint into eyetracking experiment."""
 
-import glob
+from __future__ import annotations
+
+import argparse
+from collections import namedtuple
+from fnmatch import fnmatch
 import os
-import json
 import random
+from typing import TYPE_CHECKING
 import uuid
 
-from psychopy import visual, monitors
-
 import config
-from eyetracking import MouseLink, EyeLink
-import trial
+from pseudo_latin_square import load_latin_square_stimuli
 
+# NOTE: psychopy, and trial and eyetracking which import it, are only imported
+#   when trials are built, so --plan-only does not load the graphics stack
+if TYPE_CHECKING:
+    from psychopy import visual
+    from eyetracking import EyeLink
+    import trial
 
-def construct_experiment_section(
-        video_paths:list[str],
-        eyelink:EyeLink,
-        win:visual.Window,
-        red_button:str) -> list:
-    """Constructs a single section of the main experiment.
-    
-    Each section consists of N blocks, each block consists of 3 trials. The
-    structure of each experiment section is as follows:
-        Task Reminder -> Fixation -> Block[Trial 1, 2, 3] -> Notifier
-    where the Notifier simply states the participant response has been
-    recorded.
+
+def get_image_trial(
+        win:visual.Window, image_path:str, timed:bool=False) -> trial.ImageTrial:
+    """Returns a shared ImageTrial, so each image is only loaded once.
 
     Args:
-        video_paths: A list of paths to the stimuli used in the trials.
-        eyelink: The EyeLink object used for recording eye gaze.
-        win: The window upon which the experiment will be rendered.
-        red_button: Whether the red button is "yes" or "no".
-    
+        win: The window the image is rendered to.
+        image_path: The path to the image.
+        timed: Whether the trial ends on its own (T), or by button press (F).
     Returns:
-        experiment_trials: A list of trials that define the experiment section.
+        The ImageTrial for the image.
     """
-    fixation = trial.FixationTrial(win=win)
-    # Each experiment section begins with an instruction slide
-    experiment_trials = [
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/experiment_instruction_r{red_button}.png'
-        )
-    ]
-    # We now construct the sequence of experiment blocks in this section
-    for idx, v_path in enumerate(video_paths):
-        # Path for pre- trial
-        v_pre_path = v_path.replace('_intra', '_pre')
-        # Path for post- trial
-        v_post_path = v_path.replace('_intra', '_post')
-        # The video trials that constitute a single block
-        video_stimuli = [
-            trial.VideoTrial(
-                v_pre_path, end_keys=[config.YELLOW_BUTTON], win=win),
-            trial.VideoTrial(
-                v_path, end_keys=None, win=win),
-            trial.VideoTrial(
-                v_post_path,
-                end_keys=[config.BLUE_BUTTON, config.RED_BUTTON],
-                win=win),
-        ]
-        # Append a fixation trial that preceds the experiment block
-        experiment_trials.append(fixation)
-        # Append the video trials that constitute the experiment block
-        experiment_trials.append(
-            trial.ExperimentBlock(
-                eyelink=eyelink, win=win, videos=video_stimuli, id=idx
-            )
-        )
-        # If we are not finished with the section, we remind participants of
-        #   the task before each block
-        if idx != len(video_paths)-1:
-            experiment_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path=f'data/introduction/experiment_recorded_r{red_button}.png',
-                    timed=False)
-            )
-        # Otherwise, we notify them that their response has been recorded
-        else:
-            experiment_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-    return experiment_trials
+    import trial
+    # ImageTrials already built for the window, keyed by image path and
+    #   timing. Kept on the window, so they go away with it
+    image_trials = win.__dict__.setdefault('_image_trials', {})
+    key = (image_path, timed)
+    image_trial = image_trials.get(key)
+    if image_trial is None:
+        image_trial = trial.ImageTrial(
+            win=win, image_path=image_path, timed=timed)
+        image_trials[key] = image_trial
+    return image_trial
 
 
-def construct_comprehension_section_easy(
-        eyelink:EyeLink,
-        win:visual.Window,
-        video_paths:list[str],
-        red_button:str) -> list:
-    """Constructs a single section of comprehension blocks.
-    
-    Each section consists of N blocks, each block consists of 2 trials. The
-    structure of each experiment section is as follows:
-        Task Reminder -> Fixation -> Block[Trial 1, Trial 2] -> Notifier
-    where the Notifier simply states the participant response has been
-    recorded.
+# The specification of a section of the experiment
+SectionSpec = namedtuple(
+    'SectionSpec',
+    ['intro_images', 'split_key', 'segments', 'comprehension', 'reminders'])
+
+# Image shown once the last block of a section is finished
+NOTIFIER_IMAGE = 'data/introduction/experiment_recorded.png'
+
+# Slides of the introduction phase
+INTRODUCTION_IMAGES = (
+    'data/introduction/introduction_1.png',
+    'data/introduction/introduction_2.png',
+)
+
+# Pass/fail slides of the easy (0), medium (1) and hard (2) comprehension
+PASS_COMP_IMAGES = tuple(f'data/introduction/pass_comp_{i}' for i in range(3))
+ERROR_COMP_IMAGES = tuple(f'data/introduction/error_comp_{i}' for i in range(3))
+
+# Slides shown at the end of each experiment section
+SECTION_END_IMAGES = tuple(
+    f'data/introduction/experiment_section_end_{i}' for i in range(4))
+
+# Keys that end each segment of a block (None plays the video out)
+SEGMENT_END_KEYS = {
+    '_pre': [config.YELLOW_BUTTON],
+    '_intra': None,
+    '_post': [config.BLUE_BUTTON, config.RED_BUTTON],
+}
+
+# Image paths are formatted with r="yes"/"no", the meaning of the red button.
+#   Reminders are (image path, timed) pairs shown between blocks.
+SECTION_SPECS = {
+    'experiment': SectionSpec(
+        intro_images=(
+            'data/introduction/experiment_instruction_r{r}.png',),
+        split_key='_intra',
+        segments=('_pre', '_intra', '_post'),
+        comprehension=False,
+        reminders=(
+            ('data/introduction/experiment_recorded_r{r}.png', False),)),
+    'easy': SectionSpec(
+        intro_images=(
+            'data/introduction/easy_comp_introduction_r{r}.png',
+            'data/introduction/comp_instruction_r{r}.png'),
+        split_key='_post',
+        segments=('_pre', '_post'),
+        comprehension=True,
+        reminders=(
+            (NOTIFIER_IMAGE, True),
+            ('data/introduction/comp_instruction_r{r}.png', False))),
+    'med': SectionSpec(
+        intro_images=(
+            'data/introduction/med_comp_introduction_r{r}.png',
+            'data/introduction/comp_instruction_r{r}.png'),
+        split_key='_post',
+        segments=('_pre', '_post'),
+        comprehension=True,
+        reminders=(
+            (NOTIFIER_IMAGE, True),
+            ('data/introduction/comp_instruction_r{r}.png', False))),
+    'hard': SectionSpec(
+        intro_images=(
+            'data/introduction/hard_comp_introduction_r{r}.png',
+            'data/introduction/hard_comp_instruction_r{r}.png'),
+        split_key='_intra',
+        segments=('_pre', '_intra', '_post'),
+        comprehension=True,
+        reminders=(
+            (NOTIFIER_IMAGE, True),
+            ('data/introduction/hard_comp_instruction_r{r}.png', False))),
+}
+
+
+# Patterns of the comprehension stimuli that start each block, by difficulty
+COMPREHENSION_PATTERNS = {
+    'easy': '*_easy_*_post.mp4',
+    'med': '*_med_*_post.mp4',
+    'hard': '*_hard_*_intra.mp4',
+}
+
+
+def scan_stimuli(directory:str, patterns:dict[str, str]) -> dict[str, list[str]]:
+    """Buckets the files of a directory by pattern in a single pass.
 
     Args:
-        video_paths: A list of paths to the stimuli used in the trials.
-        eyelink: The EyeLink object used for recording eye gaze.
-        win: The window upon which the experiment will be rendered.
-        red_button: Whether the red button is "yes" or "no".
-    
+        directory: The directory of stimuli to scan.
+        patterns: Shell-style patterns to match file names against, by name.
     Returns:
-        comprehension_trials: A list of trials that define the comprehension.
+        The paths of the files matching each pattern, by name.
     """
-    fixation = trial.FixationTrial(win=win)
-    comprehension_trials = [
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/easy_comp_introduction_r{red_button.lower()}.png'),
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/comp_instruction_r{red_button.lower()}.png')
-    ]
-    # Construct a sequence of experiment blocks
-    for idx, v_path in enumerate(video_paths):
-        # Path for pre- trial stimuli
-        v_pre_path = v_path.replace('_post', '_pre')
-        # The video trials that define the comprehension block
-        video_stimuli = [
-            trial.VideoTrial(
-                v_pre_path, end_keys=[config.YELLOW_BUTTON], win=win),
-            trial.VideoTrial(
-                v_path,
-                end_keys=[config.BLUE_BUTTON, config.RED_BUTTON],
-                win=win),
-        ]
-        # Assign the appropriate key presses for comprehension checking
-        if red_button.lower() == 'yes':
-            yes_button = config.RED_BUTTON
-            no_button = config.BLUE_BUTTON
-        else:
-            yes_button = config.BLUE_BUTTON
-            no_button = config.RED_BUTTON
-        # The correct key press is in the file name of the stimulus
-        if 'yes' in v_path:
-            correct_response = yes_button
-        else:
-            correct_response = no_button
-        # Append a fixation trial that precedes the comprehension trials
-        comprehension_trials.append(fixation)
-        # Append the comprehension block
-        comprehension_trials.append(
-            trial.ComprehensionBlock(
-                eyelink=eyelink,
-                videos=video_stimuli,
-                correct_response=correct_response,
-                id=idx
-            )
-        )
-        # If we are not finished with the comprehension section, we remind
-        #   participants of the task.
-        if idx != len(video_paths)-1:
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path=f'data/introduction/comp_instruction_r{red_button}.png',
-                    timed=False)
-            )
-        # Otherwise we just tell them their response was recorded.
-        else:
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-    return comprehension_trials
+    # Hidden files are skipped, as glob does
+    with os.scandir(directory) as it:
+        names = [entry.name for entry in it if not entry.name.startswith('.')]
+    return {
+        key: [os.path.join(directory, name) for name in names
+              if fnmatch(name, pattern)]
+        for key, pattern in patterns.items()
+    }
 
 
-def construct_comprehension_section_med(
-        eyelink:EyeLink,
-        win:visual.Window,
-        video_paths:list[str],
-        red_button:str) -> list:
-    """Constructs a single section of comprehension blocks.
-    
-    Each section consists of N blocks, each block consists of 2 trials. The
-    structure of each experiment section is as follows:
-        Task Reminder -> Fixation -> Block[Trial 1, Trial 2] -> Notifier
-    where the Notifier simply states the participant response has been
-    recorded.
+def block_video_paths(spec:SectionSpec, video_path:str) -> list[str]:
+    """Returns the paths of the videos of a block, one per segment.
 
     Args:
-        video_paths: A list of paths to the stimuli used in the trials.
-        eyelink: The EyeLink object used for recording eye gaze.
-        win: The window upon which the experiment will be rendered.
-        red_button: Whether the red button is "yes" or "no".
-    
+        spec: The SectionSpec describing the section.
+        video_path: The path of the stimulus the block is listed under.
     Returns:
-        comprehension_trials: A list of trials that define the comprehension.
+        The video paths, in the order the videos are played.
     """
-    fixation = trial.FixationTrial(win=win)
-    comprehension_trials = [
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/med_comp_introduction_r{red_button.lower()}.png'),
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/comp_instruction_r{red_button.lower()}.png')
+    return [
+        video_path.replace(spec.split_key, segment)
+        for segment in spec.segments
     ]
-    # Construct a sequence of experiment blocks
-    for idx, v_path in enumerate(video_paths):
-        # Path for pre- trial stimuli
-        v_pre_path = v_path.replace('_post', '_pre')
-        # The video trials that define the comprehension block
-        video_stimuli = [
-            trial.VideoTrial(
-                v_pre_path, end_keys=[config.YELLOW_BUTTON], win=win),
-            trial.VideoTrial(
-                v_path,
-                end_keys=[config.BLUE_BUTTON, config.RED_BUTTON],
-                win=win),
-        ]
-        # Assign the appropriate key presses for comprehension checking
-        if red_button.lower() == 'yes':
-            yes_button = config.RED_BUTTON
-            no_button = config.BLUE_BUTTON
-        else:
-            yes_button = config.BLUE_BUTTON
-            no_button = config.RED_BUTTON
-        # The correct key press is in the file name of the stimulus
-        if 'yes' in v_path:
-            correct_response = yes_button
-        else:
-            correct_response = no_button
-        # Append a fixation trial that precedes the comprehension trials
-        comprehension_trials.append(fixation)
-        # Append the comprehension block
-        comprehension_trials.append(
-            trial.ComprehensionBlock(
-                eyelink=eyelink,
-                videos=video_stimuli,
-                correct_response=correct_response,
-                id=idx
-            )
-        )
-        # If we are not finished with the comprehension section, we remind
-        #   participants of the task.
-        if idx != len(video_paths)-1:
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path=f'data/introduction/comp_instruction_r{red_button}.png',
-                    timed=False)
-            )
-        # Otherwise we just tell them their response was recorded.
-        else:
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-    return comprehension_trials
 
 
-def construct_comprehension_section_hard(
+def chain_blocks(sections:list[list]) -> list[trial.ExperimentBlock]:
+    """Links every experiment block to the block that runs after it.
+
+    The chain crosses sections, so the last block of a section preloads the
+    first block of the next one.
+
+    Args:
+        sections: The experiment sections, in the order they are run.
+    Returns:
+        The experiment blocks, in the order they are run.
+    """
+    import trial
+    blocks = [
+        block for section in sections for block in section
+        if isinstance(block, trial.ExperimentBlock)]
+    for block, next_block in zip(blocks, blocks[1:]):
+        block.next_block = next_block
+    return blocks
+
+
+def build_section(
+        spec:SectionSpec,
         video_paths:list[str],
         eyelink:EyeLink,
         win:visual.Window,
-        red_button:str) -> list:
-    """Constructs a single section of comprehension blocks.
+        red_button:str,
+        preloader:trial.VideoPreloader | None = None) -> list:
+    """Constructs a single section of the experiment or comprehension phase.
     
-    Each section consists of N blocks, each block consists of 3 trials. The
-    structure of each experiment section is as follows:
-        Task Reminder -> Fixation -> Block[Trial 1, Trial 2, 3] -> Notifier
-    where the Notifier simply states the participant response has been
-    recorded.
+    Each section consists of N blocks, each block consists of one trial per
+    segment of the spec. The structure of each section is as follows:
+        Instructions -> Fixation -> Block[Trial 1, ..., N] -> Reminder
+    where the last Reminder is replaced by a Notifier which simply states the
+    participant response has been recorded.
 
     Args:
+        spec: The SectionSpec describing the section.
         video_paths: A list of paths to the stimuli used in the trials.
         eyelink: The EyeLink object used for recording eye gaze.
         win: The window upon which the experiment will be rendered.
         red_button: Whether the red button is "yes" or "no".
+        preloader: Prefetches the next block's videos while a block runs, once
+            the blocks are chained with chain_blocks.
     
     Returns:
-        comprehension_trials: A list of trials that define the comprehension.
+        section_trials: A list of trials that define the section.
     """
+    import trial
+    red_button = red_button.lower()
     fixation = trial.FixationTrial(win=win)
-    comprehension_trials = [
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/hard_comp_introduction_r{red_button.lower()}.png'),
-        trial.ImageTrial(
-            win=win,
-            image_path=f'data/introduction/hard_comp_instruction_r{red_button.lower()}.png')
+    # Resolve the images of the section once, up front
+    section_trials = [
+        get_image_trial(win=win, image_path=path.format(r=red_button))
+        for path in spec.intro_images
     ]
+    reminders = [
+        get_image_trial(
+            win=win, image_path=path.format(r=red_button), timed=timed)
+        for path, timed in spec.reminders
+    ]
+    notifier = get_image_trial(win=win, image_path=NOTIFIER_IMAGE, timed=True)
+    # Assign the appropriate key presses for comprehension checking
+    if red_button == 'yes':
+        yes_button, no_button = config.RED_BUTTON, config.BLUE_BUTTON
+    else:
+        yes_button, no_button = config.BLUE_BUTTON, config.RED_BUTTON
+    # We now construct the sequence of blocks in this section
     for idx, v_path in enumerate(video_paths):
-        # Path for pre- trial
-        v_pre_path = v_path.replace('_intra', '_pre')
-        # Path for post- trial
-        v_post_path = v_path.replace('_intra', '_post')
-        # The video trials that define the comprehension block
+        # The video trials that constitute a single block
         video_stimuli = [
-            trial.VideoTrial(
-                v_pre_path, end_keys=[config.YELLOW_BUTTON], win=win),
-            trial.VideoTrial(
-                v_path, end_keys=None, win=win),
-            trial.VideoTrial(
-                v_post_path,
-                end_keys=[config.BLUE_BUTTON, config.RED_BUTTON],
-                win=win),
+            trial.VideoTrial(path, end_keys=SEGMENT_END_KEYS[segment], win=win)
+            for segment, path in zip(
+                spec.segments, block_video_paths(spec, v_path))
         ]
-        # Assign the appropriate key presses for comprehension checking
-        if red_button.lower() == 'yes':
-            yes_button = config.RED_BUTTON
-            no_button = config.BLUE_BUTTON
-        else:
-            yes_button = config.BLUE_BUTTON
-            no_button = config.RED_BUTTON
-        # The correct key press is in the file name of the stimulus
-        if 'yes' in v_path:
-            correct_response = yes_button
-        else:
-            correct_response = no_button
-        # Append a fixation trial that precedes the comprehension trials
-        comprehension_trials.append(fixation)
-        # Append the comprehension block
-        comprehension_trials.append(
-            trial.ComprehensionBlock(
-                eyelink=eyelink,
-                videos=video_stimuli,
-                correct_response=correct_response,
-                id=idx
+        # Append a fixation trial that precedes the block
+        section_trials.append(fixation)
+        if spec.comprehension:
+            # The correct key press is in the file name of the stimulus
+            section_trials.append(
+                trial.ComprehensionBlock(
+                    eyelink=eyelink,
+                    videos=video_stimuli,
+                    correct_response=yes_button if 'yes' in v_path else no_button,
+                    id=idx
+                )
             )
-        )
-        # If we are not finished with the comprehension section, we remind
-        #   participants of the task.
-        if idx != len(video_paths)-1:
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
-            )
-            comprehension_trials.append(
-                trial.ImageTrial(
-                    win=win,
-                    image_path=f'data/introduction/hard_comp_instruction_r{red_button}.png',
-                    timed=False)
-            )
-        # Otherwise we just tell them their response was recorded.
         else:
-            comprehension_trials.append(
-                trial.ImageTrial(
+            section_trials.append(
+                trial.ExperimentBlock(
+                    eyelink=eyelink,
                     win=win,
-                    image_path='data/introduction/experiment_recorded.png',
-                    timed=True)
+                    videos=video_stimuli,
+                    id=idx,
+                    preloader=preloader)
             )
-    return comprehension_trials
+        # If we are not finished with the section, we remind participants of
+        #   the task before each block
+        if idx != len(video_paths)-1:
+            section_trials.extend(reminders)
+        # Otherwise, we notify them that their response has been recorded
+        else:
+            section_trials.append(notifier)
+    return section_trials
 
 
 def check_comprehension(trials:list[trial.Trial]) -> bool:
@@ -377,8 +272,9 @@ def check_comprehension(trials:list[trial.Trial]) -> bool:
         trials: The block (list of trials) to check.
     Returns:
         True/False"""
-    _trials = [ct for ct in trials if isinstance(ct, trial.ComprehensionBlock)]
-    return all(ct.passed for ct in _trials)
+    import trial
+    return all(
+        ct.passed for ct in trials if isinstance(ct, trial.ComprehensionBlock))
 
 
 def run_introduction_block(intro_trials:list[trial.Trial]) -> None:
@@ -408,22 +304,79 @@ def run_comprehension_blocks(
     Returns:
         None
     """
+    import trial
+    pass_trial = get_image_trial(win=win, image_path=PASS_COMP_IMAGES[idx])
+    fail_trial = get_image_trial(win=win, image_path=ERROR_COMP_IMAGES[idx])
     while True:
         for ct in comprehension_blocks:
             ct.run()
         if check_comprehension(comprehension_blocks):
-            pass_trial = trial.ImageTrial(
-                win=win, image_path=f'data/introduction/pass_comp_{idx}')
             pass_trial.run()
             break
         else:
-            fail_trial = trial.ImageTrial(
-                win=win, image_path=f'data/introduction/error_comp_{idx}')
             fail_trial.run()
+    # Close the videos of any block that failed an earlier attempt
+    for ct in comprehension_blocks:
+        if isinstance(ct, trial.ComprehensionBlock):
+            ct.release()
+
+
+def plan_experiment(latin_square_sequence:str='A') -> list[str]:
+    """Lists the stimuli the experiment needs that are missing on disk.
+
+    Resolves every image and video path for both red button assignments
+    without opening a window or loading psychopy.
+
+    Args:
+        latin_square_sequence: The latin square sequence of the sections.
+    Returns:
+        The sorted paths of the missing stimuli.
+    """
+    # Stimuli directories and lists that are missing are reported as well
+    missing = set()
+    if os.path.isdir(config.COMPREHENSION_STIM_DIR):
+        comprehension_stimuli = scan_stimuli(
+            config.COMPREHENSION_STIM_DIR, COMPREHENSION_PATTERNS)
+    else:
+        missing.add(config.COMPREHENSION_STIM_DIR)
+        comprehension_stimuli = {key: [] for key in COMPREHENSION_PATTERNS}
+    if os.path.exists(config.LATIN_SQUARE_STIMULI):
+        latin_square_stimuli = load_latin_square_stimuli()
+    else:
+        missing.add(config.LATIN_SQUARE_STIMULI)
+        latin_square_stimuli = {
+            group: [] for group in config.LAT_SQR_SEQS[latin_square_sequence]}
+    sections = [
+        (SECTION_SPECS[key], comprehension_stimuli[key])
+        for key in COMPREHENSION_PATTERNS
+    ] + [
+        (SECTION_SPECS['experiment'], latin_square_stimuli[group])
+        for group in config.LAT_SQR_SEQS[latin_square_sequence]
+    ]
+    paths = {
+        NOTIFIER_IMAGE,
+        *INTRODUCTION_IMAGES,
+        *PASS_COMP_IMAGES,
+        *ERROR_COMP_IMAGES,
+        *SECTION_END_IMAGES,
+    }
+    for spec, video_paths in sections:
+        for red_button in ('yes', 'no'):
+            paths.update(
+                path.format(r=red_button) for path in spec.intro_images)
+            paths.update(
+                path.format(r=red_button) for path, _ in spec.reminders)
+        for v_path in video_paths:
+            paths.update(block_video_paths(spec, v_path))
+    missing.update(path for path in paths if not os.path.exists(path))
+    return sorted(missing)
 
 
 def main(mouse=True):
     '''Entrypoint.'''
+    from psychopy import core, visual, monitors
+    from eyetracking import MouseLink, EyeLink
+    import trial
     # Instantiate psychopy window for stimuli presentation
     monitor_width = config.MONITOR_WIDTH
     monitor_dist = config.MONITOR_DISTANCE
@@ -451,98 +404,92 @@ def main(mouse=True):
     latin_square_sequence = 'A'
     # Construct introduction phase
     introduction_block = [
-        trial.ImageTrial(win=win, image_path='data/introduction/introduction_1.png'),
-        trial.ImageTrial(win=win, image_path='data/introduction/introduction_2.png')
+        get_image_trial(win=win, image_path=path)
+        for path in INTRODUCTION_IMAGES
     ]
     # Construct comprehension phase
-    easy_comprehension_section = construct_comprehension_section_easy(
-        video_paths=glob.glob(
-            os.path.join('data/comprehension','*_easy_*_post.mp4')),
+    comprehension_stimuli = scan_stimuli(
+        config.COMPREHENSION_STIM_DIR, COMPREHENSION_PATTERNS)
+    easy_comprehension_section = build_section(
+        SECTION_SPECS['easy'],
+        video_paths=comprehension_stimuli['easy'],
         eyelink=el,
         win=win,
         red_button=red_button,
     )
-    medium_comprehension_section = construct_comprehension_section_med(
-        video_paths=glob.glob(
-            os.path.join('data/comprehension','*_med_*_post.mp4')),
+    medium_comprehension_section = build_section(
+        SECTION_SPECS['med'],
+        video_paths=comprehension_stimuli['med'],
         eyelink=el,
         win=win,
         red_button=red_button,
     )
-    hard_comprehension_section = construct_comprehension_section_hard(
-        video_paths=glob.glob(
-            os.path.join('data/comprehension','*_hard_*_intra.mp4')),
+    hard_comprehension_section = build_section(
+        SECTION_SPECS['hard'],
+        video_paths=comprehension_stimuli['hard'],
         eyelink=el,
         win=win,
         red_button=red_button,
     )
     # Construct main experiment phase. Gather stimuli
-    with open('data/latin_square_stimuli.json', 'r') as f:
-        latin_square_stimuli = json.load(f)
-        latin_square_stimuli = {
-            int(k):v for k,v in latin_square_stimuli.items()}
+    latin_square_stimuli = load_latin_square_stimuli()
     # Shuffle within groups
     for key in latin_square_stimuli:
         random.shuffle(latin_square_stimuli[key])
-    experiment_section_0 = construct_experiment_section(
-        video_paths=latin_square_stimuli[
-            config.LAT_SQR_SEQS[latin_square_sequence][0]],
-        eyelink=el,
-        win=win,
-        red_button=red_button)
-    experiment_section_0.append(
-        trial.ImageTrial(
-            win=win, image_path='data/introduction/experiment_section_end_0')
-    )
-    experiment_section_1 = construct_experiment_section(
-        video_paths=latin_square_stimuli[
-            config.LAT_SQR_SEQS[latin_square_sequence][1]],
-        eyelink=el,
-        win=win,
-        red_button=red_button)
-    experiment_section_1.append(
-        trial.ImageTrial(
-            win=win, image_path='data/introduction/experiment_section_end_1')
-    )
-    experiment_section_2 = construct_experiment_section(
-        video_paths=latin_square_stimuli[
-            config.LAT_SQR_SEQS[latin_square_sequence][2]],
-        eyelink=el,
-        win=win,
-        red_button=red_button)
-    experiment_section_2.append(
-        trial.ImageTrial(
-            win=win, image_path='data/introduction/experiment_section_end_2')
-    )
-    experiment_section_3 = construct_experiment_section(
-        video_paths=latin_square_stimuli[
-            config.LAT_SQR_SEQS[latin_square_sequence][3]],
-        eyelink=el,
-        win=win,
-        red_button=red_button)
-    experiment_section_3.append(
-        trial.ImageTrial(
-            win=win, image_path='data/introduction/experiment_section_end_3')
-    )
-    el.calibrate()
-    # Introduction phase
-    run_introduction_block(introduction_block)
-    # Comprehension phase
-    run_comprehension_blocks(easy_comprehension_section, win, 0)
-    run_comprehension_blocks(medium_comprehension_section, win, 1)
-    run_comprehension_blocks(hard_comprehension_section, win, 2)
-    # Main experiment phase
-    for experiment_block in experiment_section_0:
-        experiment_block.run()
-    for experiment_block in experiment_section_1:
-        experiment_block.run()
-    for experiment_block in experiment_section_2:
-        experiment_block.run()
-    for experiment_block in experiment_section_3:
-        experiment_block.run()
+    preloader = trial.VideoPreloader()
+    experiment_sections = []
+    for section_idx, group in enumerate(
+            config.LAT_SQR_SEQS[latin_square_sequence]):
+        experiment_section = build_section(
+            SECTION_SPECS['experiment'],
+            video_paths=latin_square_stimuli[group],
+            eyelink=el,
+            win=win,
+            red_button=red_button,
+            preloader=preloader)
+        experiment_section.append(
+            get_image_trial(
+                win=win, image_path=SECTION_END_IMAGES[section_idx])
+        )
+        experiment_sections.append(experiment_section)
+    experiment_blocks = chain_blocks(experiment_sections)
+    # Raise the process priority while stimuli are shown, so the scheduler
+    #   is less likely to preempt it near a flip
+    core.rush(True)
+    try:
+        el.calibrate()
+        # Introduction phase
+        run_introduction_block(introduction_block)
+        # Comprehension phase
+        run_comprehension_blocks(easy_comprehension_section, win, 0)
+        run_comprehension_blocks(medium_comprehension_section, win, 1)
+        run_comprehension_blocks(hard_comprehension_section, win, 2)
+        # Main experiment phase. Each block preloads the next one, so only
+        #   the first is preloaded here
+        if experiment_blocks:
+            preloader.preload(experiment_blocks[0].videos)
+        for experiment_section in experiment_sections:
+            for experiment_block in experiment_section:
+                experiment_block.run()
+    finally:
+        core.rush(False)
+        # Prefetches are no use past this point, even after an error
+        preloader.shutdown(wait=False, cancel_futures=True)
     el.save_data(config.EXP1_DATA_DIR, latin_square_sequence)
     el.close_connection()
 
 
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description='Runs the eyetracking experiment.')
+    arg_parser.add_argument(
+        '--plan-only', action='store_true',
+        help='Check that all stimuli exist without opening a window.')
+    args = arg_parser.parse_args()
+    if args.plan_only:
+        missing = plan_experiment()
+        for path in missing:
+            print(f'Missing stimulus: {path}')
+        print(f'{len(missing)} missing stimuli')
+        raise SystemExit(1 if missing else 0)
     main(mouse=False)
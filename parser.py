@@ -1,20 +1,32 @@
 """A basic parser for .asc files recorded from the EyeLink tracker."""
 
 from collections import namedtuple
+import mmap
+import os
 import re
 
+import numpy as np
+from numpy.lib import recfunctions
+
 # Precompile all regex patterns for better performance
-BLOCK_START_RE = re.compile(r'MSG\s+(\d+)\s+BLOCK_START')
-BLOCK_END_RE = re.compile(r'MSG\s+(\d+)\s+BLOCK_END') 
-TRIAL_START_RE = re.compile(r'MSG\s+(\d+)\s+TRIAL_START')
-TRIAL_END_RE = re.compile(r'MSG\s+(\d+)\s+TRIAL_END')
-BUTTON_PRESS_RE = re.compile(r'MSG\s+(\d+)\s+BUTTON_PRESS\s+([a-z_]+)')
-VIDEO_START_RE = re.compile(r'MSG\s+(\d+)\s+VIDEO_START')
-TRIAL_VAR_RE = re.compile(r'MSG\s+(\d+)\s+!V\s+TRIAL_VAR\s+([a-z_]+)\s+([a-z0-9_.]+)')
-FIXATION_RE = re.compile(r'EFIX (L|R)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+)')
-SACCADE_RE = re.compile(r'ESACC (L|R)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+)')
-BLINK_RE = re.compile(r'EBLINK (L|R)\s+(\d+)\s+(\d+)\s+(\d+)')
-GAZE_RE = re.compile(r'(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+).*\.\.\.') 
+# All experiment messages in one pattern. The message kind is the name of the
+#   outermost group that matched, i.e. m.lastgroup
+MSG_RE = re.compile(
+    rb'MSG\s+(?P<time>\d+)\s+(?:'
+    rb'(?P<block_start>BLOCK_START)'
+    rb'|(?P<block_end>BLOCK_END)'
+    rb'|(?P<trial_start>TRIAL_START)'
+    rb'|(?P<trial_end>TRIAL_END)'
+    rb'|(?P<button_press>BUTTON_PRESS\s+(?P<button>[a-z_]+))'
+    rb'|(?P<video_start>VIDEO_START)'
+    rb'|(?P<trial_var>!V\s+TRIAL_VAR\s+(?P<var_name>[a-z_]+)\s+(?P<value>[a-z0-9_.]+))'
+    rb')')
+FIXATION_RE = re.compile(rb'EFIX (L|R)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+)')
+SACCADE_RE = re.compile(rb'ESACC (L|R)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+)')
+BLINK_RE = re.compile(rb'EBLINK (L|R)\s+(\d+)\s+(\d+)\s+(\d+)')
+# Matches every gaze sample line in a region of the file at once
+GAZE_RE = re.compile(
+    rb'^(\d+)[ \t]+(\d+\.\d+)[ \t]+(\d+\.\d+)[ \t]+(\d+\.\d+).*\.\.\.', re.MULTILINE)
 
 # Parser data types
 Fixation = namedtuple('Fixation', ['start', 'stop', 'x', 'y'])
@@ -23,6 +35,45 @@ Mouse = namedtuple('Mouse', ['time', 'x', 'y'])
 Saccade = namedtuple('Saccade', ['start', 'stop', 'start_x', 'start_y', 'end_x', 'end_y', 'amp', 'peak_vel'])
 Blink = namedtuple('Blink', ['start', 'stop'])
 
+# Structured array layouts of the samples and events of a trial
+GAZE_DTYPE = np.dtype([(field, np.float64) for field in Gaze._fields])
+FIXATION_DTYPE = np.dtype([(field, np.float64) for field in Fixation._fields])
+SACCADE_DTYPE = np.dtype([(field, np.float64) for field in Saccade._fields])
+BLINK_DTYPE = np.dtype([(field, np.float64) for field in Blink._fields])
+
+
+def parse_gaze_samples(data, start:int, end:int) -> np.ndarray:
+    """Parses the gaze samples in a region of the .asc file in bulk.
+
+    Lines that are not complete samples, e.g. during blinks, and lines that
+    are not samples at all are skipped.
+
+    Args:
+        data: The contents of the .asc file, e.g. a mmap.
+        start: Offset of the first line of the region.
+        end: Offset just past the last line of the region.
+    Returns:
+        A GAZE_DTYPE structured array with one row per sample.
+    """
+    samples = np.array(
+        GAZE_RE.findall(data, start, end), dtype=np.float64).reshape(-1, 4)
+    samples[:, 0] /= 1000
+    return recfunctions.unstructured_to_structured(samples, dtype=GAZE_DTYPE)
+
+def parse_event_groups(groups:list[tuple], dtype:np.dtype) -> np.ndarray:
+    """Converts the regex groups of a trial's events in bulk.
+
+    Args:
+        groups: One tuple of raw field values per event, starting with the
+            start and stop times in milliseconds.
+        dtype: The structured array layout of the events.
+    Returns:
+        A structured array with one row per event, with times in seconds.
+    """
+    values = np.array(groups, dtype=np.float64).reshape(-1, len(dtype.names))
+    values[:, :2] /= 1000
+    return recfunctions.unstructured_to_structured(values, dtype=dtype)
+
 def parse_eyedata(asc_file='data/pilots/test/raw.asc') -> dict:
     """Parses .asc files recorded from the EyeLink eye tracker."""
     # Trial lists
@@ -48,32 +99,78 @@ def parse_eyedata(asc_file='data/pilots/test/raw.asc') -> dict:
     fixations = []
     saccades = []
     blinks = []
-    gaze = []
+    gaze_start = 0
+
+    with open(asc_file, 'rb') as f:
+        # mmap refuses empty files
+        if os.fstat(f.fileno()).st_size == 0:
+            return trials
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mm, 'madvise'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+    # Lines are read as bytes straight from the mapping; only the few values
+    #   kept as strings are decoded
+    with mm:
+        for line in iter(mm.readline, b''):
+            # Dispatch on the first character so that each line is only tested
+            #   against the patterns it could match. Gaze samples dominate the
+            #   file, so they are checked first.
+            first = line[:1]
+
+            # Skip gaze samples, they are parsed in bulk straight from the
+            #   file at the end of the trial
+            if b'0' <= first <= b'9':
+                continue
 
-    with open(asc_file, 'r') as f:
-        for line in f:
-            # Parse trial start messages e.g. "MSG 314108 BLOCK_START"
-            if m := BLOCK_START_RE.match(line):
-                block_time_start = float(m.group(1)) / 1000
+            if first == b'E':
+                # Parse fixation events. The fields are kept as raw bytes and
+                #   converted in bulk at the end of the trial
+                if m := FIXATION_RE.match(line):
+                    fixations.append(m.group(2, 3, 5, 6))
+                    continue
+
+                # Parse saccade events
+                if m := SACCADE_RE.match(line):
+                    saccades.append(m.group(2, 3, 5, 6, 7, 8, 9, 10))
+                    continue
+
+                # Parse blink events
+                if m := BLINK_RE.match(line):
+                    blinks.append(m.group(2, 3))
+                continue
+
+            # Only messages are left to parse, skip e.g. SFIX, START and END
+            if first != b'M':
                 continue
 
+            m = MSG_RE.match(line)
+            if m is None:
+                continue
+            kind = m.lastgroup
+
+            # Parse trial start messages e.g. "MSG 314108 BLOCK_START"
+            if kind == 'block_start':
+                block_time_start = float(m.group('time')) / 1000
+
             # Parse trial end messages e.g. "MSG 314108 BLOCK_END"
-            if m := BLOCK_END_RE.match(line):
-                block_time_end = float(m.group(1)) / 1000
+            elif kind == 'block_end':
+                block_time_end = float(m.group('time')) / 1000
                 block_duration = block_time_end - block_time_start
                 block_idx = None
-                continue
             
             # Parse trial start messages e.g. "MSG 314108 TRIAL_START"
-            if m := TRIAL_START_RE.match(line):
-                trial_time_start = float(m.group(1)) / 1000
+            elif kind == 'trial_start':
+                trial_time_start = float(m.group('time')) / 1000
                 assert trial == {}, ValueError("Should be empty")
-                continue
 
             # Parse trial end messages e.g. "MSG 314108 TRIAL_END"
-            if m := TRIAL_END_RE.match(line):
-                trial_time_end = float(m.group(1)) / 1000
+            elif kind == 'trial_end':
+                trial_time_end = float(m.group('time')) / 1000
                 trial_duration = trial_time_end - trial_time_start
+                # The trial's samples are those since the previous trial ended
+                gaze_end = mm.tell()
                 
                 # Build trial dict all at once
                 trial = {
@@ -89,10 +186,10 @@ def parse_eyedata(asc_file='data/pilots/test/raw.asc') -> dict:
                     'scene_name': scene_name,
                     'button_response': button_response,
                     'stimulus_onset_time': stim_onset_time,
-                    'gaze': gaze,
-                    'fixations': fixations,
-                    'saccades': saccades,
-                    'blinks': blinks
+                    'gaze': parse_gaze_samples(mm, gaze_start, gaze_end),
+                    'fixations': parse_event_groups(fixations, FIXATION_DTYPE),
+                    'saccades': parse_event_groups(saccades, SACCADE_DTYPE),
+                    'blinks': parse_event_groups(blinks, BLINK_DTYPE)
                 }
 
                 trials.append(trial)
@@ -100,69 +197,30 @@ def parse_eyedata(asc_file='data/pilots/test/raw.asc') -> dict:
                 # Reset all trial variables at once
                 trial_idx = trial_time_start = trial_time_end = button_response = None
                 stim_onset_time = scene_name = response_time = None
-                fixations, saccades, blinks, gaze = [], [], [], []
+                fixations, saccades, blinks = [], [], []
+                gaze_start = gaze_end
                 trial = {}
-                continue
             
             # Parse trial end messages e.g. "MSG 314108 BUTTON_PRESS"
-            if m := BUTTON_PRESS_RE.match(line):
-                button_response = m.group(2)
-                continue
+            elif kind == 'button_press':
+                button_response = m.group('button').decode('ascii')
 
             # Parse trial end messages e.g. "MSG 314108 VIDEO_START"
-            if m := VIDEO_START_RE.match(line):
-                stim_onset_time = float(m.group(1)) / 1000
-                continue
+            elif kind == 'video_start':
+                stim_onset_time = float(m.group('time')) / 1000
 
             # Parse trial variable messages
-            if m := TRIAL_VAR_RE.match(line):
-                onset_time = float(m.group(1)) / 1000
-                var_name = m.group(2)
-                value = m.group(3)
+            elif kind == 'trial_var':
+                var_name = m.group('var_name')
+                value = m.group('value')
                 
-                if var_name == 'rt':
+                if var_name == b'rt':
                     response_time = float(value)
-                elif var_name == 'scene_name':
-                    scene_name = value
-                elif var_name == 'trial_index':
+                elif var_name == b'scene_name':
+                    scene_name = value.decode('ascii')
+                elif var_name == b'trial_index':
                     trial_idx = int(value)
-                elif var_name == 'block_index':
+                elif var_name == b'block_index':
                     block_idx = int(value)
-                continue
-
-            # Parse fixation events
-            if m := FIXATION_RE.match(line):
-                _, start, stop, dur, x, y, pupil = m.groups()
-                start, stop = float(start)/1000, float(stop)/1000
-                x, y = float(x), float(y)
-                fixations.append(Fixation(start, stop, x, y))
-                continue
-
-            # Parse saccade events
-            if m := SACCADE_RE.match(line):
-                groups = m.groups()
-                start = float(groups[1])/1000
-                stop = float(groups[2])/1000
-                start_x, start_y = float(groups[4]), float(groups[5])
-                end_x, end_y = float(groups[6]), float(groups[7])
-                amp, peak_vel = float(groups[8]), float(groups[9])
-                saccades.append(Saccade(start, stop, start_x, start_y, end_x, end_y, amp, peak_vel))
-                continue
-
-            # Parse blink events
-            if m := BLINK_RE.match(line):
-                start = float(m.group(2))/1000
-                stop = float(m.group(3))/1000
-                blinks.append(Blink(start, stop))
-                continue
-
-            # Parse gaze events
-            if m := GAZE_RE.match(line):
-                onset_time = float(m.group(1))/1000
-                x_pos = float(m.group(2))
-                y_pos = float(m.group(3))
-                pupil = float(m.group(4))
-                gaze.append(Gaze(onset_time, x_pos, y_pos, pupil))
-                continue
 
     return trials
@@ -1,10 +1,17 @@
 """Utilities for partitioning stimuli according to a pseudo latin square."""
 
+import argparse
+from fnmatch import fnmatch
+import functools
 import json
-import glob
 import os
 import random
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 import config
 
 
@@ -22,26 +29,77 @@ def partition_list(items, num_groups=4):
     return groups
 
 
-def main():
-    # Grab all stimuli
-    video_paths = glob.glob(os.path.join(config.TRIAL_STIM_DIR,'*_intra.mp4'))
-    # Shuffle stimuli
-    random.shuffle(video_paths)
-    # Partition into four groups
-    stimuli_groups = {
-        idx:group for idx, group in enumerate(partition_list(video_paths))
-    }
-    with open('data/latin_square_stimuli.json', 'w') as f:
-        json.dump(stimuli_groups, f)
-    with open('data/latin_square_stimuli.json', 'r') as f:
-        latin_square_stimuli = json.load(f)
-        latin_square_stimuli = {
-            int(k):v for k,v in latin_square_stimuli.items()}
-    print(latin_square_stimuli[0])
-    for key in latin_square_stimuli:
-        random.shuffle(latin_square_stimuli[key])
-    print(latin_square_stimuli[0])
+@functools.lru_cache(maxsize=8)
+def _read_stimuli_groups(path, mtime_ns):
+    """Parses the stimuli groups JSON; cached on the file's mtime."""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+
+def load_latin_square_stimuli(
+        path=config.LATIN_SQUARE_STIMULI) -> dict[int, list[str]]:
+    """Loads the latin square stimuli groups.
+
+    Args:
+        path: Path to the JSON file written by `main`.
+    Returns:
+        A dictionary mapping group index to a fresh list of stimuli paths.
+    """
+    groups = _read_stimuli_groups(path, os.stat(path).st_mtime_ns)
+    return {int(k):list(v) for k,v in groups.items()}
+
+
+def is_up_to_date(
+        path=config.LATIN_SQUARE_STIMULI,
+        stim_dir=config.TRIAL_STIM_DIR) -> bool:
+    """Checks whether the stimuli groups were written after the stimuli changed.
+
+    Adding or removing stimuli updates the directory's mtime.
+
+    Args:
+        path: Path to the JSON file written by `main`.
+        stim_dir: The directory of trial stimuli.
+    Returns:
+        True if the JSON file is newer than the stimuli directory.
+    """
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(stim_dir).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def main(force=False):
+    if not force and is_up_to_date():
+        # Keep the existing partition, the stimuli haven't changed
+        stimuli_groups = load_latin_square_stimuli()
+    else:
+        # Grab all stimuli in a single pass over the directory
+        with os.scandir(config.TRIAL_STIM_DIR) as it:
+            video_paths = [
+                os.path.join(config.TRIAL_STIM_DIR, entry.name)
+                for entry in it
+                if not entry.name.startswith('.')
+                and fnmatch(entry.name, '*_intra.mp4')
+            ]
+        # Shuffle stimuli
+        random.shuffle(video_paths)
+        # Partition into four groups
+        stimuli_groups = {
+            idx:group for idx, group in enumerate(partition_list(video_paths))
+        }
+        with open(config.LATIN_SQUARE_STIMULI, 'w') as f:
+            json.dump(stimuli_groups, f)
+    print(stimuli_groups[0])
+    for key in stimuli_groups:
+        random.shuffle(stimuli_groups[key])
+    print(stimuli_groups[0])
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description='Partitions the trial stimuli into latin square groups.')
+    parser.add_argument(
+        '--force', action='store_true',
+        help='Repartition even if the stimuli have not changed.')
+    args = parser.parse_args()
+    main(force=args.force)
\ No newline at end of file
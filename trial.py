@@ -1,9 +1,12 @@
 """Utilities for defining experimental trials for eyetracking experiment."""
 
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
 import random
 import time
 
+import numpy as np
+
 # NOTE: These packages are lazily imported
 from psychopy import core, visual, event
 
@@ -11,8 +14,137 @@ import config
 import eyetracking
 
 
+# Vertices of the fixation cross
+_FIXATION_VERTICES = ((0, -0.05), (0, 0.05), (0, 0), (-0.05, 0), (0.05, 0))
+
+
+def _cached_stim(win:visual.Window, name:str, build) -> visual.BaseVisualStim:
+    """Returns the window's shared stimulus, building it on first use.
+
+    Args:
+        win: The window the stimulus is drawn to.
+        name: The name of the stimulus.
+        build: Called with no arguments to build the stimulus.
+    Returns:
+        The shared stimulus.
+    """
+    # The cache lives on the window, so it goes away with the window and is
+    #   never handed to a new window with a recycled id
+    stims = win.__dict__.setdefault('_shared_stims', {})
+    stim = stims.get(name)
+    if stim is None:
+        stim = stims[name] = build()
+    return stim
+
+
+# Layout of a block's gaze samples, one row per sample
+GAZE_DTYPE = np.dtype(eyetracking.SAMPLE_DTYPE.descr + [('trial', np.int16)])
+
+
+def _gaze_buffer(n:int=0) -> np.ndarray:
+    """Returns an empty gaze buffer with room for a typical block, or n rows."""
+    return np.empty(
+        max(n, int(config.MAX_BLOCK_S * config.SAMPLING_HZ * 1.2)),
+        dtype=GAZE_DTYPE)
+
+
 class Block:
-    """For type annotations."""
+    """Base class for blocks of VideoTrials played while recording gaze.
+
+    Args:
+        eyelink: The pylink.EyeLink object (tracker).
+        videos: The sequence of VideoTrials that make the block.
+        id: The id of the Block.
+    """
+
+    def __init__(
+            self,
+            eyelink:eyetracking.EyeLink | eyetracking.MouseLink,
+            videos:list['VideoTrial'],
+            id:int):
+        self.eyelink = eyelink
+        self.videos = videos
+        # Allocated by the first record_samples, see _reserve
+        self._gaze:np.ndarray | None = None
+        self._gaze_n = 0
+        self.video_start_time = None
+        self.id = id
+        self.responses = {}
+
+    @property
+    def gaze_data(self) -> np.ndarray:
+        """A GAZE_DTYPE view of the samples recorded so far."""
+        if self._gaze is None:
+            return np.empty(0, dtype=GAZE_DTYPE)
+        return self._gaze[:self._gaze_n]
+
+    def _reserve(self, n:int) -> None:
+        if self._gaze is None:
+            self._gaze = _gaze_buffer(n)
+        # Grow the buffer when a block runs past the expected length
+        elif self._gaze_n + n > len(self._gaze):
+            self._gaze = np.concatenate(
+                (self._gaze, np.empty(
+                    max(n, len(self._gaze)), dtype=GAZE_DTYPE)))
+
+    def record_samples(self, samples:np.ndarray, trial_idx:int) -> None:
+        """Records a trial's gaze samples.
+
+        Args:
+            samples: SAMPLE_DTYPE rows, as returned by `drain_samples`.
+            trial_idx: The index of the trial within the block.
+        """
+        n = len(samples)
+        self._reserve(n)
+        rows = self._gaze[self._gaze_n:self._gaze_n + n]
+        for field in eyetracking.SAMPLE_DTYPE.names:
+            rows[field] = samples[field]
+        rows['trial'] = trial_idx
+        self._gaze_n += n
+
+    def stop_video_and_tracking(self, video:'VideoTrial') -> None:
+        """Stop recording from eye tracker."""
+        self.eyelink.stop_recording()
+        # Get participant response time, from the key press if there was one
+        if video.rt is None:
+            video.rt = (time.perf_counter_ns() - self.video_start_time) * 1e-9
+        # Send trial variable info
+        self.eyelink.message('!V TRIAL_VAR scene_name %s' % (
+            video.name))
+        self.eyelink.message('!V TRIAL_VAR rt %f' % (video.rt))
+
+    def record_response(self, video:'VideoTrial') -> None:
+        """Stores the participant's response to a video."""
+        self.responses[video.name] = {'response': video.response, 'rt': video.rt}
+
+    def run_trials(self) -> None:
+        """Plays the block's videos, recording gaze during each of them."""
+        # Open all of the block's videos before its first trial starts
+        for v in self.videos:
+            v.prepare()
+        # Send block onset message
+        self.eyelink.message('BLOCK_START')
+        self.eyelink.message('!V TRIAL_VAR block_index %d' % (self.id))
+        for trial_index, v in enumerate(self.videos):
+            self.eyelink.message('TRIAL_START')
+            self.eyelink.start_recording()
+            self.eyelink.clear_samples()
+            self.video_start_time = time.perf_counter_ns()
+            v.play(eyelink=self.eyelink)
+            self.stop_video_and_tracking(v)
+            self.record_response(v)
+            self.eyelink.message('!V TRIAL_VAR trial_index %d' % (trial_index))
+            self.eyelink.message('TRIAL_END')
+            # Collect the samples still queued on the link once the trial is
+            #   timed, so draining doesn't count towards its duration
+            self.record_samples(self.eyelink.drain_samples(), trial_index)
+        # Send block offset message
+        self.eyelink.message('BLOCK_END')
+
+    def release(self) -> None:
+        """Closes the block's videos."""
+        for v in self.videos:
+            v.release()
 
 
 class Trial:
@@ -54,13 +186,41 @@ class ImageTrial(Trial):
             self.win.flip()
             time.sleep(0.5)
             return
-        while True:
-            self.draw()
-            self.win.flip()
-            keys = event.getKeys([config.YELLOW_BUTTON])
-            if config.YELLOW_BUTTON in keys:
-                return True  # Continue with the experiment
-            event.clearEvents()
+        # The image is static, so draw it once and block until the key press
+        self.draw()
+        self.win.flip()
+        event.waitKeys(keyList=[config.YELLOW_BUTTON])
+        return True  # Continue with the experiment
+
+
+class VideoPreloader:
+    """Prefetches video files on background threads.
+
+    Reading a video ahead of time puts it in the OS page cache, so opening
+    it at trial start does not wait on the disk. Decoding itself stays on the
+    main thread, which owns the GL context.
+
+    Attributes:
+        executor: The thread pool the prefetches run on.
+    """
+
+    def __init__(self, max_workers:int=2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def preload(self, videos:list['VideoTrial']) -> None:
+        """Submits a prefetch for each video not already being prefetched."""
+        for v in videos:
+            if v.prefetched is None:
+                v.prefetched = self.executor.submit(v.prefetch)
+
+    def shutdown(self, wait:bool=True, cancel_futures:bool=False) -> None:
+        """Stops the worker threads.
+
+        Args:
+            wait: Whether to block until running prefetches are done.
+            cancel_futures: Whether to drop prefetches that have not started.
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
 
 
 class VideoTrial(Trial):
@@ -78,42 +238,64 @@ class VideoTrial(Trial):
         self.name = path.split('/')[-1].split('.')[0]
         self.end_keys = end_keys
         self.video = None
+        self.played = False
         self.response = None
         self.rt = None
         self.win = win
+        self.prefetched:Future | None = None
+
+    def prefetch(self, chunk_size:int=1 << 20) -> None:
+        """Reads the video file so that it is in the OS page cache."""
+        with open(self.path, 'rb', buffering=0) as f:
+            # Let the kernel read ahead in the background where it can,
+            #   rather than copying the whole file through this thread
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                return
+            while f.read(chunk_size):
+                pass
 
     def _play_button(self, eyelink):
-        event.clearEvents()
+        # Key presses are timestamped by the keyboard backend, relative to
+        #   the first flip of the video
+        kb = eyetracking.get_keyboard()
+        kb.clearEvents()
+        self.win.callOnFlip(kb.clock.reset)
         eyelink.message('VIDEO_START')
         self.video.play()
         while True:
             # Draw video frame
             self.video.draw()
             self.video.win.flip()
-            keys = event.getKeys(self.end_keys)
-            for key in self.end_keys:
-                if key in keys:
-                    # Move to next video
-                    self.video.stop()
-                    eyelink.message('BUTTON_PRESS %s' % key)
-                    eyelink.message('VIDEO_END')
-                    return key
-            event.clearEvents()
+            presses = kb.getKeys(
+                keyList=self.end_keys, waitRelease=False, clear=True)
+            if presses:
+                # Move to next video
+                key = presses[0].name
+                self.rt = presses[0].rt
+                self.video.pause()
+                eyelink.message('BUTTON_PRESS %s' % key)
+                eyelink.message('VIDEO_END')
+                return key
 
     def _play_timed(self, eyelink):
-        event.clearEvents()
         eyelink.message('VIDEO_START')
         self.video.play()
         while not self.video.isFinished:
             # Draw video frame
             self.video.draw()
             self.video.win.flip()
-        self.video.stop()
+        self.video.pause()
         eyelink.message('VIDEO_END')
-        event.clearEvents()
         return
 
-    def play(self, eyelink):
+    def prepare(self) -> None:
+        """Opens the video, so the decoder starts up before the trial does."""
+        if self.video is not None:
+            return
+        # Don't open the file while it is still being prefetched
+        if self.prefetched is not None:
+            self.prefetched.result()
         self.video = visual.MovieStim(
             win=self.win,
             filename=self.path,
@@ -121,17 +303,36 @@ class VideoTrial(Trial):
                 config.DEFAULT_WIDTH * config.STIM_SCALE,
                 config.DEFAULT_HEIGHT * config.STIM_SCALE),
             pos=(0, 0),
+            movieLib=config.MOVIE_LIB,
             noAudio=True
         )
+
+    def release(self) -> None:
+        """Closes the video once its block is over."""
+        if self.video is not None:
+            # stop() would reopen the file; unload() frees decoder and texture
+            self.video.unload()
+        self.video = None
+        self.played = False
+
+    def play(self, eyelink):
+        self.response = None
+        self.rt = None
+        self.prepare()
+        # Playback is only paused at the end of a video, since stop() closes
+        #   the player and reloads the file. Rewinding the paused video lets
+        #   a rerun block reuse the open decoder
+        if self.played:
+            self.video.seek(0.0)
+        self.played = True
+        # Drop stale key presses once before the video, and presses made
+        #   during it once after
         event.clearEvents()
         if self.end_keys:
             self.response = self._play_button(eyelink)
-            event.clearEvents()
         else:
             self._play_timed(eyelink)
-            event.clearEvents()
         event.clearEvents()
-        self.video = None
 
 
 class FixationTrial(Trial):
@@ -145,14 +346,14 @@ class FixationTrial(Trial):
 
     def __init__(self, win):
         self.win = win
-        self.shape = visual.ShapeStim(
+        self.shape = _cached_stim(win, 'fixation', lambda: visual.ShapeStim(
             win=win,
-            vertices=((0, -0.05), (0, 0.05), (0, 0), (-0.05, 0), (0.05, 0)),
+            vertices=_FIXATION_VERTICES,
             lineWidth=6,
             lineColor='black',
             closeShape=False,
             colorSpace='rgb'
-        )
+        ))
 
     def draw(self):
         '''This method overrides psychopy's weird lazy importing issues.
@@ -181,64 +382,42 @@ class ExperimentBlock(Block):
         videos: The sequence of VideoTrials that make the block.
         win: Psychopy window object.
         id: The id of the Block.
+        preloader: Prefetches the next block's videos while this one runs.
     '''
     def __init__(
             self,
             eyelink:eyetracking.EyeLink,
             win,
             videos:list[VideoTrial],
-            id:int):
-        self.eyelink = eyelink
-        self.videos = videos
-        self.response_recorded = visual.ImageStim(
-            win=win,
-            image='data/introduction/experiment_recorded.png',
-            pos=(0,0)
-        )
-        self.gaze_data = []
-        self.video_start_time = None
-        self.id = id
-        self.responses = {}
-
-    def stop_video_and_tracking(self, video) -> None:
-        """Stop recording from eye tracker."""
-        self.eyelink.stop_recording()
-        # Get participant response time
-        response_time = time.time() - self.video_start_time
-        # Send trial variable info
-        self.eyelink.message('!V TRIAL_VAR scene_name %s' % (
-            video.name))
-        self.eyelink.message('!V TRIAL_VAR rt %f' % (response_time))
-        video.rt = response_time
-        event.clearEvents()
+            id:int,
+            preloader:VideoPreloader | None = None):
+        super().__init__(eyelink, videos, id)
+        self.preloader = preloader
+        self.next_block:ExperimentBlock | None = None
+        self.response_recorded = _cached_stim(
+            win, 'response_recorded', lambda: visual.ImageStim(
+                win=win,
+                image='data/introduction/experiment_recorded.png',
+                pos=(0,0)
+            ))
 
     def run(self) -> None:
         """Run forward the video trial."""
-        # Send block onset message
-        self.eyelink.message('BLOCK_START')
-        self.eyelink.message('!V TRIAL_VAR block_index %d' % (self.id))
-        for trial_index, v in enumerate(self.videos):
-            self.eyelink.message('TRIAL_START')
-            self.eyelink.start_recording()
-            self.video_start_time = time.time()
-            v.play(eyelink=self.eyelink)
-            self.stop_video_and_tracking(v)
-            self.responses[v.name] = {'response': v.response, 'rt': v.rt}
-            self.eyelink.message('!V TRIAL_VAR trial_index %d' % (trial_index))
-            self.eyelink.message('TRIAL_END')
-        self.eyelink.message('BLOCK_END')
+        if self.preloader is not None and self.next_block is not None:
+            self.preloader.preload(self.next_block.videos)
+        self.run_trials()
+        self.release()
         self.response_recorded.draw()
         self.response_recorded.win.flip()
         time.sleep(0.5)
 
-        # Send trial offset message
-
 
 class ComprehensionBlock(Block):
     '''Class for a Comprehension Block.
 
     A ComprehensionBlock is a tuple of VideoTrials, usually a pre-, intra-, and
-    post-video of a given scene.
+    post-video of a given scene. A failed block keeps its videos open, since
+    a failed comprehension check reruns it; `release` closes them.
     
     Args:
         eyelink: The pylink.EyeLink object (tracker).
@@ -252,51 +431,31 @@ class ComprehensionBlock(Block):
             videos:list[VideoTrial],
             correct_response:str,
             id:int):
-        self.eyelink = eyelink
-        self.videos = videos
-        self.gaze_data = []
-        self.video_start_time = None
-        self.id = id
+        super().__init__(eyelink, videos, id)
         self.correct_response = correct_response
         self.passed = None
-        self.responses = {}
 
     def reset(self):
         self.passed = None
         self.responses = {}
         self.video_start_time = None
-        self.gaze_data = []
+        self._gaze_n = 0
 
-    def stop_video_and_tracking(self, video) -> None:
-        """Stop recording from eye tracker."""
-        event.clearEvents()
-        self.eyelink.stop_recording()
-        # Get participant response time
-        response_time = time.time() - self.video_start_time
-        # Send trial variable info
-        self.eyelink.message('!V TRIAL_VAR scene_name %s' % (
-            video.name))
-        self.eyelink.message('!V TRIAL_VAR rt %f' % (response_time))
-        video.rt = response_time
+    def record_response(self, video:VideoTrial) -> None:
+        """Stores the response, and checks it on the post-video."""
+        super().record_response(video)
+        if '_post' in video.name:
+            self.passed = self.correct_response == video.response
 
     def run(self) -> None:
         """Run forward the video trial."""
-        # Send trial onset message
-        self.eyelink.message('BLOCK_START')
-        self.eyelink.message('!V TRIAL_VAR block_index %d' % (self.id))
-        for trial_index, v in enumerate(self.videos):
-            self.eyelink.message('TRIAL_START')
-            self.eyelink.start_recording()
-            self.video_start_time = time.time()
-            v.play(eyelink=self.eyelink)
-            self.stop_video_and_tracking(v)
-            self.responses[v.name] = {'response': v.response, 'rt': v.rt}
-            if '_post' in v.name:
-                self.passed = self.correct_response == v.response
-            self.eyelink.message('!V TRIAL_VAR trial_index %d' % (trial_index))
-            self.eyelink.message('TRIAL_END')
-        # Send trial offset message
-        self.eyelink.message('BLOCK_END')
+        # A rerun after a failed check starts from a clean slate
+        self.reset()
+        self.run_trials()
+        # Only a failed block guarantees a rerun, so a passed one doesn't
+        #   hold its decoders open through the rest of the section
+        if self.passed:
+            self.release()
 
 
 if __name__ == '__main__':